@@ -1,21 +1,44 @@
 import io
 import logging
+import time
 import wave
 
+# Начало запуска фиксируется до тяжёлых импортов (torch, whisper, chainlit, sentence-transformers),
+# чтобы их время входило в отчёт о запуске (шаг imports)
+STARTED_AT = time.perf_counter()
+
 import chainlit as cl
 import numpy as np
 import torch
 import whisper
-
-from config import APP_LLM_NAME, MONGO_DB_PATH
+from chainlit.server import app as chainlit_app
+
+from config import (
+    APP_LLM_NAME,
+    AUDIO_SAMPLE_RATE,
+    LAZY_STARTUP,
+    MONGO_DB_PATH,
+    STARTUP_READY_TIMEOUT,
+    WHISPER_MODEL_NAME,
+)
 from handler import SupplierHandler, SupplierOptions
+from monitoring.endpoint import mount_metrics_endpoint, mount_readiness_endpoint
+from speech import StreamingTranscription, TranscriptionQueueFull, TranscriptionWorker
+from startup import Startup
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
+startup = Startup(started_at=STARTED_AT)
+startup.mark("imports")
+
 DEVICE = "cuda:1" if torch.cuda.is_available() else "cpu"
-WHISPER_MODEL = whisper.load_model("turbo", device=DEVICE)
-print(f"Whisper инициализирован на {DEVICE}")
+# Распознавание выполняется в отдельном пуле потоков, чтобы не блокировать event loop;
+# модель Whisper загружается прогревом (или первым распознаванием), а не при импорте
+transcriber = TranscriptionWorker(
+    device=DEVICE,
+    model_loader=lambda: whisper.load_model(WHISPER_MODEL_NAME, device=DEVICE),
+)
 
 
 def Supplier_handler() -> SupplierHandler:
@@ -27,6 +50,35 @@ def Supplier_handler() -> SupplierHandler:
 
 
 handler = Supplier_handler()
+startup.mark("handler_created")
+
+# Прогрев: первый эмбеддинг, коллекции Milvus, MongoDB, первое распознавание речи.
+# При ленивом старте выполняется в фоне, и сервер начинает принимать подключения сразу
+for name, step in handler.warm_up_steps():
+    startup.add_step(name, step)
+startup.add_step("whisper", transcriber.warm_up)
+if LAZY_STARTUP:
+    startup.start_background()
+else:
+    startup.run()
+
+# Метрики пайплайна в формате Prometheus на том же сервере, что и Chainlit: GET /metrics
+mount_metrics_endpoint(chainlit_app)
+# Готовность для балансировщика: GET /ready отвечает 503, пока идёт прогрев
+mount_readiness_endpoint(chainlit_app, startup.status)
+
+
+async def wait_until_ready() -> bool:
+    """Запросы, пришедшие во время прогрева, ждут его окончания с сообщением пользователю."""
+    if startup.ready:
+        return True
+    notice = cl.Message(content="⏳ Ассистент запускается, ответ начнётся через несколько секунд…")
+    await notice.send()
+    ready = await startup.wait_ready(STARTUP_READY_TIMEOUT)
+    await notice.remove()
+    if not ready:
+        await cl.Message(content="⚠️ Ассистент ещё не готов к работе, попробуйте позже").send()
+    return ready
 
 
 @cl.set_starters
@@ -53,7 +105,7 @@ async def set_starters():
 
 @cl.on_chat_start
 async def start():
-    cl.user_session.set("audio_chunks", [])
+    cl.user_session.set("audio_stream", None)
 
 
 @cl.on_message
@@ -63,10 +115,23 @@ async def main(message: cl.Message):
     cl.user_session.set("last_user_input", user_input)  # сохраняем последний ввод
     logger.info(f"📨 Текстовый ввод: {user_input}")
 
+    if not await wait_until_ready():
+        return
+
     msg = cl.Message(content="")
     await msg.send()
 
-    result, _ = await handler.ahandle_prompt(user_input, str(user_id))
+    # Пока ответ не начал генерироваться, показываем статусы выполнения нод,
+    # затем передаём токены ответа по мере их получения
+    answer_started = False
+    async for event in handler.astream_prompt(user_input, str(user_id)):
+        if event["type"] == "status" and not answer_started:
+            await msg.stream_token(event["content"], is_sequence=True)
+        elif event["type"] == "token":
+            await msg.stream_token(event["content"], is_sequence=not answer_started)
+            answer_started = True
+        elif event["type"] == "final":
+            msg.content = event["content"]
 
     # FIXME: fix images part
     # image_paths = [img["image_path"] for img in image_data]
@@ -82,7 +147,6 @@ async def main(message: cl.Message):
     #     else:
     #         logger.warning(f"⚠️ Изображение не найдено: {image_path}")
 
-    await msg.stream_token(result)
     await msg.update()
 
     # if image_elements:
@@ -108,7 +172,7 @@ async def main(message: cl.Message):
     if response and "payload" in response:
         value = response["payload"].get("value")
         if value != "next":
-            handler.assistant._save_flat_log(user_id, "rating", value, value)
+            await handler.assistant._asave_flat_log(user_id, "rating", value, value)
             await cl.Message(content="✅ Спасибо за вашу оценку!").send()
 
         else:
@@ -118,39 +182,52 @@ async def main(message: cl.Message):
 
 @cl.on_audio_start
 async def on_audio_start():
-    cl.user_session.set("audio_chunks", [])
+    # Запись распознаётся окнами в фоне, пока пользователь говорит
+    previous = cl.user_session.get("audio_stream")
+    if previous is not None:
+        previous.cancel()
+    cl.user_session.set("audio_stream", StreamingTranscription(transcriber))
     return True
 
 
 @cl.on_audio_chunk
 async def on_audio_chunk(chunk: cl.InputAudioChunk):
-    chunks = cl.user_session.get("audio_chunks")
+    stream = cl.user_session.get("audio_stream")
     audio_data = np.frombuffer(chunk.data, dtype=np.int16)
-    chunks.append(audio_data)
+    stream.feed(audio_data)
 
 
 @cl.on_audio_end
 async def on_audio_end():
-    audio_chunks = cl.user_session.get("audio_chunks")
+    stream = cl.user_session.get("audio_stream")
+    cl.user_session.set("audio_stream", None)
 
-    if not audio_chunks:
+    if stream is None or stream.buffer.total == 0:
         await cl.Message(content="🔇 Аудио слишком короткое").send()
         return
 
-    audio_data = np.concatenate(audio_chunks)
+    if not await wait_until_ready():
+        stream.cancel()
+        return
+
+    try:
+        # Здесь распознаётся только хвост записи, остальные окна уже распознаны
+        transcription = await stream.finish()
+    except TranscriptionQueueFull:
+        logger.warning("Transcription queue is full, voice message rejected")
+        await cl.Message(
+            content="⏳ Распознавание речи сейчас перегружено, попробуйте ещё раз или напишите текстом"
+        ).send()
+        return
+
+    # WAV нужен только для проигрывания записи в чате
     wav_buffer = io.BytesIO()
     with wave.open(wav_buffer, "wb") as wav_file:
         wav_file.setnchannels(1)
         wav_file.setsampwidth(2)
-        wav_file.setframerate(24000)
-        wav_file.writeframes(audio_data.tobytes())
-    wav_buffer.seek(0)
-
-    with open("temp_audio.wav", "wb") as f:
-        f.write(wav_buffer.read())
+        wav_file.setframerate(AUDIO_SAMPLE_RATE)
+        wav_file.writeframes(stream.recorded_audio().tobytes())
 
-    result = WHISPER_MODEL.transcribe("temp_audio.wav")
-    transcription = result["text"]
     logger.info(f"🗣️ Распознан текст: {transcription}")
 
     await cl.Message(
@@ -1,15 +1,40 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import List, TypedDict
+from typing import Annotated, List, Optional, TypedDict
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.mongodb import MongoDBSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph
 from pymongo import MongoClient
 
-from config import MONGO_DB_PATH
+from config import (
+    CLASSIFICATION_ROUTES,
+    DEFAULT_CLASSIFICATION_ROUTE,
+    RETRIEVAL_MODE,
+    SUMMARY_MAX_CHUNK_CONTEXT,
+    SUMMARY_MAX_CONCURRENCY,
+    SUMMARY_MIN_CHUNK_LENGTH,
+    SUMMARY_ONLINE_FALLBACK,
+    TEMPLATE_ANSWERS,
+)
+from monitoring import instrument_node
 from runnables import SupplierRunnablesVLLM
+from storage import BufferedLogSink, get_logs_collection, get_mongo_client
+
+
+def merge_search_results(current: Optional[List[dict]], update: Optional[List[dict]]) -> List[dict]:
+    """
+    Редьюсер результатов поиска для параллельных веток графа.
+
+    Результаты из нескольких веток объединяются, None сбрасывает накопленные результаты
+    (используется в начале обработки нового запроса, т.к. состояние треда сохраняется между запросами).
+    """
+    if update is None:
+        return []
+    return (current or []) + update
 
 
 class State(TypedDict):
@@ -18,11 +43,15 @@ class State(TypedDict):
     original_query: str  # Новое поле для хранения оригинального запроса
     final_output: str
     user_id: str
-    search_results_faq: List[dict]
-    search_results_rag: List[dict]
+    search_results_faq: Annotated[List[dict], merge_search_results]
+    search_results_rag: Annotated[List[dict], merge_search_results]
+    search_results_hybrid: Annotated[List[dict], merge_search_results]
     classification_results: str
+    classification_valid: bool  # False, если категория подставлена по умолчанию из-за нераспознанного ответа LLM
     # image_data: str # FIXME: fix images part
     combined_text: str
+    was_summarized: bool
+    answer_cacheable: bool  # ответ сформирован по найденным данным и может попасть в семантический кэш
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -33,37 +62,69 @@ class SupplierAssistant:
     def __init__(
         self,
         Supplier_runnables: SupplierRunnablesVLLM,
-        checkpointer: MongoDBSaver,
+        checkpointer: BaseCheckpointSaver,
+        mongo_client: Optional[MongoClient] = None,
+        log_sink: Optional[BufferedLogSink] = None,
     ) -> None:
         self.Supplier_runnables = Supplier_runnables
-        self.mongo_client = MongoClient(MONGO_DB_PATH)
+        # Общий для процесса клиент MongoDB, если он не передан явно
+        self.mongo_client = mongo_client or get_mongo_client()
         self.db = self.mongo_client["checkpointing_db"]
-        self.logs_collection = self.db["logs"]
+        self.logs_collection = get_logs_collection(self.mongo_client)
+        # Логи пишутся в фоне пачками, ноды не ждут ответа MongoDB
+        self.log_sink = log_sink or BufferedLogSink(self.logs_collection)
+
+        # Поиск одной гибридной нодой (BM25 + E5 с RRF) или двумя параллельными, см. RETRIEVAL_MODE
+        if RETRIEVAL_MODE == "hybrid" and Supplier_runnables.hybrid_chain is not None:
+            search_nodes = {"hybrid_search": self.hybrid_search}
+        else:
+            search_nodes = {"rag_search": self.rag_search, "fag_search": self.fag_search}
+        self.search_nodes = list(search_nodes)
+
+        # Разбор запроса одним вызовом LLM (UNDERSTAND_FUSED) или последовательными перефразом и классификацией
+        if Supplier_runnables.understand is not None:
+            understand_nodes = {"understand": self.understand}
+        else:
+            understand_nodes = {"paraphrase": self.paraphrase, "classification": self.classification}
 
         graph_builder = StateGraph(State)
 
-        # Добавляем ноды
-        graph_builder.add_node("paraphrase", self.paraphrase)
-        graph_builder.add_node("classification", self.classification)
-        graph_builder.add_node("rag_search", self.rag_search)
-        graph_builder.add_node("fag_search", self.fag_search)
-        graph_builder.add_node("summary", self.summary)
-        graph_builder.add_node("answer", self.answer)
-
-        # Настраиваем граф
-        graph_builder.set_entry_point("paraphrase")
-        graph_builder.add_edge("paraphrase", "classification")
-        graph_builder.add_edge("classification", "fag_search")
-        graph_builder.add_edge("fag_search", "rag_search")
-        graph_builder.add_edge("rag_search", "summary")
+        # Добавляем ноды (с замером длительности каждой ноды)
+        nodes = {
+            **understand_nodes,
+            **search_nodes,
+            "summary": self.summary,
+            "answer": self.answer,
+            "template_answer": self.template_answer,
+        }
+        for name, node in nodes.items():
+            graph_builder.add_node(name, instrument_node(name, node))
+
+        # Настраиваем граф: после классификации запрос направляется по маршруту из CLASSIFICATION_ROUTES.
+        # Поисковые ноды выполняются параллельно и сходятся перед суммаризацией,
+        # простые сообщения и перевод на оператора обходятся без поиска и суммаризации
+        if "understand" in understand_nodes:
+            graph_builder.set_entry_point("understand")
+            classified_node = "understand"
+        else:
+            graph_builder.set_entry_point("paraphrase")
+            graph_builder.add_edge("paraphrase", "classification")
+            classified_node = "classification"
+        graph_builder.add_conditional_edges(
+            classified_node,
+            self.route,
+            [*self.search_nodes, "answer", "template_answer"],
+        )
+        graph_builder.add_edge(self.search_nodes, "summary")
         graph_builder.add_edge("summary", "answer")
         graph_builder.add_edge("answer", END)
+        graph_builder.add_edge("template_answer", END)
 
         self.graph = graph_builder.compile(checkpointer=checkpointer)
 
     def _save_flat_log(self, user_id: str, action: str, query: str, details: str):
         """
-        Сохраняет лог в MongoDB в плоском табличном формате
+        Сохраняет лог в MongoDB в плоском табличном формате (через фоновую очередь BufferedLogSink)
 
         Args:
             user_id: ID пользователя
@@ -72,13 +133,16 @@ class SupplierAssistant:
             details: Текстовые детали выполнения
         """
         log_entry = {"user_id": user_id, "action": action, "details": details, "timestamp": datetime.now()}
-        try:
-            self.logs_collection.insert_one(log_entry)
-            logger.info(f"Log saved: {action} for user {user_id}")
-        except Exception as e:
-            logger.error(f"Log save failed: {e}")
+        self.log_sink.write(log_entry)
+        logger.info(f"Log queued: {action} for user {user_id}")
+
+    async def _asave_flat_log(self, user_id: str, action: str, query: str, details: str):
+        """
+        Асинхронный вариант _save_flat_log (запись только ставится в очередь и не блокирует event loop).
+        """
+        self._save_flat_log(user_id, action, query, details)
 
-    def paraphrase(self, state: State, config: RunnableConfig) -> State:
+    async def paraphrase(self, state: State, config: RunnableConfig) -> State:
         """
         Нода для перефразирования запроса:
         - Исправляет опечатки и грамматические ошибки
@@ -90,7 +154,7 @@ class SupplierAssistant:
         original_query = state["query"]
 
         # Выполняем перефраз
-        paraphrase_result = self.Supplier_runnables.paraphrase.invoke(
+        paraphrase_result = await self.Supplier_runnables.paraphrase.ainvoke(
             {"query": original_query, "messages": state.get("messages", [])}
         )
 
@@ -98,72 +162,171 @@ class SupplierAssistant:
 
         # Логируем результат
         log_details = f"Перефразировано: {original_query} -> {paraphrased_query}"
-        self._save_flat_log(state["user_id"], "paraphrase", original_query, log_details)
+        if paraphrase_result.source != "llm":
+            log_details += f" ({paraphrase_result.source})"
+        await self._asave_flat_log(state["user_id"], "paraphrase", original_query, log_details)
+
+        return self._new_turn_state(original_query, paraphrased_query)
 
-        # Обновляем состояние с перефразированным запросом
+    @staticmethod
+    def _new_turn_state(original_query: str, paraphrased_query: str) -> State:
+        # Обновляем состояние с перефразированным запросом.
+        # Ноды возвращают только изменённые поля, т.к. часть из них выполняется параллельно
         return {
-            **state,
             "query": paraphrased_query,
             "original_query": original_query,  # Сохраняем оригинальный запрос в состоянии
+            "search_results_faq": None,  # Сбрасываем результаты поиска предыдущего запроса
+            "search_results_rag": None,
+            "search_results_hybrid": None,
+            "combined_text": "",
+            "was_summarized": False,
+            "answer_cacheable": False,
         }
 
-    def classification(self, state: State, config: RunnableConfig) -> State:
-        result = self.Supplier_runnables.classification.invoke(
+    async def classification(self, state: State, config: RunnableConfig) -> State:
+        result = await self.Supplier_runnables.classification.ainvoke(
             {"query": state["query"], "messages": state.get("messages", []), "user_id": state["user_id"]}
         )
-        self._save_flat_log(state["user_id"], "query", state["query"], state["query"])
+        await self._asave_flat_log(state["user_id"], "query", state["query"], state["query"])
+        details = f"Классификация: {result.classification}"
+        if result.source == "local":
+            # Отличаем локальные предсказания от меток LLM, на которых обучается локальный классификатор
+            details += f" (local, {result.confidence:.2f})"
+        elif result.source == "fallback":
+            details += " (fallback)"
+        await self._asave_flat_log(state["user_id"], "classification", state["query"], details)
+
+        return {"classification_results": result.classification, "classification_valid": result.source != "fallback"}
+
+    async def understand(self, state: State, config: RunnableConfig) -> State:
+        """
+        Нода разбора запроса одним вызовом LLM: перефраз и классификация вместе (см. nodes/understand.py).
+        Пишет те же логи, что и ноды paraphrase и classification.
+        """
+        original_query = state["query"]
+        result = await self.Supplier_runnables.understand.ainvoke(
+            {"query": original_query, "messages": state.get("messages", [])}
+        )
+        query = result.paraphrased_query
+
+        log_details = f"Перефразировано: {original_query} -> {query}"
+        if result.source != "llm":
+            log_details += f" ({result.source})"
+        await self._asave_flat_log(state["user_id"], "paraphrase", original_query, log_details)
+        await self._asave_flat_log(state["user_id"], "query", query, query)
         details = f"Классификация: {result.classification}"
-        self._save_flat_log(state["user_id"], "classification", state["query"], details)
+        if result.source == "local":
+            details += f" (local, {result.confidence:.2f})"
+        elif result.source == "fallback":
+            details += " (fallback)"
+        await self._asave_flat_log(state["user_id"], "classification", query, details)
 
-        return {**state, "classification_results": result.classification}
+        return {
+            **self._new_turn_state(original_query, query),
+            "classification_results": result.classification,
+            "classification_valid": result.source != "fallback",
+        }
+
+    @staticmethod
+    def _route_name(state: State) -> str:
+        """
+        Маршрут запроса по его классу (см. CLASSIFICATION_ROUTES в config.py): retrieval, direct или template.
+        Категория, подставленная по умолчанию, не выбирает маршрут: такой запрос идёт в поиск.
+        """
+        if not state["classification_valid"]:
+            return DEFAULT_CLASSIFICATION_ROUTE
+        return CLASSIFICATION_ROUTES.get(state["classification_results"], DEFAULT_CLASSIFICATION_ROUTE)
 
-    def fag_search(self, state: State, config: RunnableConfig) -> State:
-        result = self.Supplier_runnables.faq_chain.invoke(
+    def route(self, state: State) -> List[str]:
+        """
+        Выбирает следующие ноды по классу запроса (см. CLASSIFICATION_ROUTES в config.py)
+        """
+        route = self._route_name(state)
+        if route == "template" and state["classification_results"] in TEMPLATE_ANSWERS:
+            return ["template_answer"]
+        if route in ("direct", "template"):
+            return ["answer"]
+        return list(self.search_nodes)
+
+    async def fag_search(self, state: State, config: RunnableConfig) -> State:
+        result = await self.Supplier_runnables.faq_chain.ainvoke(
             {"query": state["query"], "messages": state.get("messages", []), "user_id": state["user_id"]}
         )
 
         details = f"Найдено FAQ документов: {len(result.search_results)}"
-        self._save_flat_log(state["user_id"], "fag_search", state["query"], details)
+        await self._asave_flat_log(state["user_id"], "fag_search", state["query"], details)
 
-        return {**state, "search_results_faq": result.search_results}
+        return {"search_results_faq": result.search_results}
 
-    def rag_search(self, state: State, config: RunnableConfig) -> State:
-        result = self.Supplier_runnables.rag_chain.invoke(
+    async def rag_search(self, state: State, config: RunnableConfig) -> State:
+        result = await self.Supplier_runnables.rag_chain.ainvoke(
             {"query": state["query"], "messages": state.get("messages", []), "user_id": state["user_id"]}
         )
 
         details = f"Найдено RAG документов: {len(result.search_results)}"
-        self._save_flat_log(state["user_id"], "rag_search", state["query"], details)
+        await self._asave_flat_log(state["user_id"], "rag_search", state["query"], details)
+
+        return {"search_results_rag": result.search_results}
+
+    async def hybrid_search(self, state: State, config: RunnableConfig) -> State:
+        result = await self.Supplier_runnables.hybrid_chain.ainvoke(
+            {"query": state["query"], "messages": state.get("messages", []), "user_id": state["user_id"]}
+        )
+
+        bm25_count = sum(1 for doc in result.search_results if doc["retriever"] == "bm25")
+        details = (
+            f"Найдено документов: {len(result.search_results)} "
+            f"(BM25: {bm25_count}, E5: {len(result.search_results) - bm25_count})"
+        )
+        await self._asave_flat_log(state["user_id"], "hybrid_search", state["query"], details)
 
-        return {**state, "search_results_rag": result.search_results}
+        return {"search_results_hybrid": result.search_results}
 
-    def summary(self, state: State, config: RunnableConfig) -> State:
+    async def summary(self, state: State, config: RunnableConfig) -> State:
         """
         Нода для суммаризации найденных чанков:
         - Проверяет каждый чанк отдельно
-        - Суммаризирует чанки длиннее 1500 символов
+        - Суммаризирует чанки длиннее SUMMARY_MIN_CHUNK_LENGTH символов: берёт заранее
+          посчитанную суммаризацию, а при её отсутствии (и SUMMARY_ONLINE_FALLBACK) обращается к LLM
         - Объединяет все чанки (оригинальные и суммаризированные)
         - Сохраняет ключевые термины, цифры, реквизиты
         """
         processed_chunks = []
 
-        # Обрабатываем FAQ чанки
-        for doc in state.get("search_results_faq", []):
-            content = doc["content"]
-            processed_chunks.append(f"{content[:300]}")
+        # Гибридный поиск возвращает уже объединённую по RRF выдачу; иначе сначала FAQ, затем RAG
+        docs = state.get("search_results_hybrid") or (
+            [{**doc, "retriever": "bm25"} for doc in state.get("search_results_faq", [])]
+            + [{**doc, "retriever": "e5"} for doc in state.get("search_results_rag", [])]
+        )
+        # Короткие чанки FAQ (BM25) только обрезаются, длинные RAG чанки (E5) суммаризируются
+        long_rag = [
+            i
+            for i, doc in enumerate(docs)
+            if doc["retriever"] == "e5" and len(doc["content"]) > SUMMARY_MIN_CHUNK_LENGTH
+        ]
+
+        # Для длинных RAG чанков берём заранее посчитанную суммаризацию
+        summary_store = self.Supplier_runnables.summary_store
+        stored = {i: summary_store.get(docs[i]["collection"], docs[i].get("id"), docs[i]["content"]) for i in long_rag}
+
+        # Остальные длинные чанки суммаризируем через LLM параллельно
+        # (с ограничением числа одновременных запросов к LLM)
+        semaphore = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+        online = [docs[i]["content"] for i in long_rag if stored[i] is None and SUMMARY_ONLINE_FALLBACK]
+        summaries = iter(
+            await asyncio.gather(*(self._summarize_chunk(state, content, semaphore) for content in online))
+        )
 
-        # Обрабатываем RAG чанки
-        for doc in state.get("search_results_rag", []):
+        # Обрабатываем чанки, сохраняя порядок выдачи
+        for i, doc in enumerate(docs):
             content = doc["content"]
-            if len(content) > 600:
-                # Суммаризируем длинные чанки
-                summary_result = self.Supplier_runnables.summary.invoke(
-                    {
-                        "text": "Запрос пользователя: " + state["query"] + "Контекст: " + content[:2000],
-                        "messages": state.get("messages", []),
-                    }
-                )
-                processed_chunks.append(f"{summary_result.summary}")
+            summary = stored.get(i)
+            if doc["retriever"] == "bm25":
+                processed_chunks.append(f"{content[:300]}")
+            elif summary is not None:
+                processed_chunks.append(f"{summary}")
+            elif len(content) > SUMMARY_MIN_CHUNK_LENGTH and SUMMARY_ONLINE_FALLBACK:
+                processed_chunks.append(f"{next(summaries)}")
             else:
                 processed_chunks.append(f"{content[:250]}")
 
@@ -171,7 +334,7 @@ class SupplierAssistant:
         combined_text = "\n\n".join(processed_chunks)
 
         # Логируем результат
-        original_count = len(state.get("search_results_faq", [])) + len(state.get("search_results_rag", []))
+        original_count = len(docs)
         summarized_count = sum(1 for chunk in processed_chunks if "суммаризировано" in chunk)
 
         log_details = (
@@ -180,26 +343,42 @@ class SupplierAssistant:
             f"Итоговый размер: {len(combined_text)} символов"
         )
 
-        self._save_flat_log(state["user_id"], "summary", state["query"], log_details)
+        await self._asave_flat_log(state["user_id"], "summary", state["query"], log_details)
 
         # Обновляем состояние
-        return {**state, "combined_text": combined_text, "was_summarized": summarized_count > 0}
-
-    def answer(self, state: State, config: RunnableConfig) -> State:
+        return {"combined_text": combined_text, "was_summarized": summarized_count > 0}
+
+    async def _summarize_chunk(self, state: State, content: str, semaphore: asyncio.Semaphore) -> str:
+        async with semaphore:
+            summary_result = await self.Supplier_runnables.summary.ainvoke(
+                {
+                    "text": f"Запрос пользователя: {state['query']}Контекст: {content[:SUMMARY_MAX_CHUNK_CONTEXT]}",
+                    "messages": state.get("messages", []),
+                }
+            )
+        return summary_result.summary
+
+    async def answer(self, state: State, config: RunnableConfig) -> State:
         """
         Нода для формирования ответа на основе суммаризированных данных
         """
         # Используем уже обработанный текст из состояния
         context = state.get("combined_text", "")
 
-        answer_result = self.Supplier_runnables.answer.invoke(
+        # Токены ответа передаются в поток графа (stream_mode="custom") по мере генерации
+        writer = get_stream_writer()
+        tokens = []
+        async for token in self.Supplier_runnables.answer.astream(
             {
                 "context": context,
                 "query": state["query"] + "\nЗапрос пользователя до перефраза:\n" + state["original_query"],
             }
-        )
+        ):
+            tokens.append(token)
+            writer({"token": token})
 
-        full_output = f"{answer_result.final_output}\n\nClassification: {state['classification_results']}"
+        answer_text = "".join(tokens).strip()
+        full_output = f"{answer_text}\n\nClassification: {state['classification_results']}"
 
         # Логируем финальный ответ
         self._save_flat_log(
@@ -210,7 +389,25 @@ class SupplierAssistant:
         )
 
         return {
-            **state,
+            "final_output": full_output,
+            # В кэш ответов попадают только ответы по найденным данным, не прямые и не шаблонные
+            "answer_cacheable": bool(answer_text) and self._route_name(state) == "retrieval",
+            "messages": state.get("messages", [])
+            + [HumanMessage(content=state["query"]), AIMessage(content=full_output)],
+        }
+
+    async def template_answer(self, state: State, config: RunnableConfig) -> State:
+        """
+        Нода для фиксированного ответа без обращения к LLM (см. TEMPLATE_ANSWERS в config.py)
+        """
+        answer = TEMPLATE_ANSWERS[state["classification_results"]]
+        get_stream_writer()({"token": answer})
+
+        full_output = f"{answer}\n\nClassification: {state['classification_results']}"
+
+        await self._asave_flat_log(state["user_id"], "answer", state["query"], "Шаблонный ответ")
+
+        return {
             "final_output": full_output,
             "messages": state.get("messages", [])
             + [HumanMessage(content=state["query"]), AIMessage(content=full_output)],
@@ -0,0 +1,132 @@
+"""
+OpenAI-совместимый сервер-заглушка вместо vLLM для бенчмарка.
+
+Отвечает на /v1/chat/completions (обычный и потоковый режим) с настраиваемой задержкой
+до первого токена и между токенами. Ответ зависит от цепочки, распознаваемой по промпту:
+перефраз возвращает исходный запрос, классификация — категорию по ключевым словам,
+разбор запроса (understand) — JSON с обоими полями,
+суммаризация — начало текста, ответ — answer_tokens слов.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Для участия в закупке необходимо зарегистрироваться на Портале поставщиков, "
+    "подписать заявку усиленной квалифицированной электронной подписью и направить её заказчику "
+    "в сроки, указанные в извещении о проведении закупки."
+).split()
+
+
+@dataclass
+class FakeLLMSettings:
+    ttft: float = 0.2  # секунды до первого токена
+    token_latency: float = 0.02  # секунды между токенами
+    answer_tokens: int = 120
+
+
+def _classify(query: str) -> str:
+    query = query.lower()
+    if any(word in query for word in ("привет", "добрый день", "спасибо")):
+        return "нейтрально"
+    if any(word in query for word in ("оператор", "поддержк")):
+        return "оператор"
+    if any(word in query for word in ("ошибк", "не работает", "не открывается", "проблем")):
+        return "проблема"
+    if "что такое" in query or "что означает" in query:
+        return "термин"
+    return "работа"
+
+
+def _after(marker: str, text: str) -> str:
+    return text.split(marker, 1)[1].strip().split("\n", 1)[0].strip()
+
+
+def generate_tokens(messages: List[dict], settings: FakeLLMSettings) -> List[str]:
+    content = messages[-1]["content"] if messages else ""
+    if "Запрос для перефраза:" in content:
+        return [_after("Запрос для перефраза:", content)]
+    if "Запрос для разбора:" in content:
+        query = _after("Запрос для разбора:", content)
+        return [json.dumps({"paraphrased_query": query, "classification": _classify(query)}, ensure_ascii=False)]
+    if "Запрос для классификации:" in content:
+        return [_classify(_after("Запрос для классификации:", content))]
+    if "Сократите текст" in content:
+        text = content.split("Текст:", 1)[-1]
+        return text.split()[:40]
+    return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(settings.answer_tokens)]
+
+
+def create_app(settings: FakeLLMSettings) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        tokens = generate_tokens(body.get("messages", []), settings)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", "")).split()) for m in body.get("messages", [])),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(settings.ttft + settings.token_latency * max(len(tokens) - 1, 0))
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": body.get("model", ""),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": " ".join(t.strip() for t in tokens)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events() -> AsyncIterator[str]:
+            def chunk(choices, **extra) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", ""),
+                    "choices": choices,
+                    **extra,
+                }
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            await asyncio.sleep(settings.ttft)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(settings.token_latency)
+                yield chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield chunk([], usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def serve(host: str, port: int, settings: FakeLLMSettings) -> None:
+    uvicorn.run(create_app(settings), host=host, port=port, log_level="warning")
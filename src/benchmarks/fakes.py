@@ -0,0 +1,183 @@
+"""
+Локальные заглушки Milvus, модели эмбеддингов и MongoDB для бенчмарка.
+
+Коллекции заполняются синтетическими чанками о работе на Портале поставщиков; поиск по ним
+(BM25 по пересечению слов и косинусный по эмбеддингам заглушки) выполняется в памяти
+с настраиваемой задержкой, как у сетевого запроса.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import COLLECTIONS, E5_COLLECTIONS
+
+EMBEDDING_DIM = 64
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+SAMPLE_TOPICS = [
+    "Регистрация поставщика на Портале поставщиков выполняется с использованием электронной подписи",
+    "Заявка на участие в закупке подписывается усиленной квалифицированной электронной подписью",
+    "Начальная (максимальная) цена контракта указывается заказчиком в извещении о закупке",
+    "Котировочная сессия проводится для закупок малого объёма по 44-ФЗ и 223-ФЗ",
+    "Оферта поставщика публикуется в каталоге продукции и должна содержать цену и сроки поставки",
+    "Универсальный передаточный документ формируется в разделе электронного исполнения контракта",
+    "Личный кабинет поставщика содержит разделы контракты, котировочные сессии и профиль компании",
+    "Ошибка подписания документа возникает при истёкшем сертификате электронной подписи",
+    "Стандартная товарная единица создаётся на основе позиции КТРУ с заполнением характеристик",
+    "Претензионная работа по контракту ведётся через раздел электронного исполнения",
+]
+
+SAMPLE_QUERIES = [
+    "Как зарегистрироваться на портале поставщиков?",
+    "Как подписать заявку на участие в закупке?",
+    "Что такое НМЦК?",
+    "Как участвовать в котировочной сессии по 44 фз?",
+    "Как опубликовать оферту в каталоге?",
+    "Где сформировать УПД по контракту?",
+    "Не открывается личный кабинет поставщика",
+    "Ошибка при подписании документа электронной подписью",
+    "Как создать СТЕ?",
+    "Привет!",
+    "Соедините меня с оператором",
+    "Как направить претензию по контракту?",
+]
+
+FILLER = (
+    "Порядок действий описан в регламенте работы Портала поставщиков. Пользователь открывает раздел, "
+    "заполняет обязательные поля карточки и сохраняет изменения, после чего документ подписывается "
+    "и направляется контрагенту. Статус документа отображается в списке документов раздела. "
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def hashed_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Детерминированный bag-of-words эмбеддинг: похожие по словам тексты близки по косинусу."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in tokenize(text):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class FakeEmbeddingModel(Embeddings):
+    """Заглушка модели E5 с задержкой прямого прохода."""
+
+    def __init__(self, latency: float = 0.02) -> None:
+        self.latency = latency
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return hashed_embedding(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def _sample_chunks(rng: random.Random, count: int) -> List[str]:
+    chunks = []
+    for i in range(count):
+        topic = SAMPLE_TOPICS[i % len(SAMPLE_TOPICS)]
+        # Часть чанков длиннее SUMMARY_MIN_CHUNK_LENGTH, чтобы в бенчмарк попадала суммаризация
+        chunks.append(f"{topic}. " + FILLER * rng.randint(1, 4))
+    return chunks
+
+
+class FakeMilvusPool:
+    """
+    Заглушка MilvusCollectionPool: те же search/preload/on_reload, данные и поиск в памяти.
+    """
+
+    def __init__(self, latency: float = 0.01, chunks_per_collection: int = 200, seed: int = 0) -> None:
+        self.latency = latency
+        rng = random.Random(seed)
+        self._collections: Dict[str, List[SimpleNamespace]] = {}
+        self._vectors: Dict[str, np.ndarray] = {}
+
+        for name in COLLECTIONS:
+            self._collections[name] = [
+                SimpleNamespace(id=i, words=set(tokenize(text)), fields={"title": text[:80], "description": text})
+                for i, text in enumerate(_sample_chunks(rng, chunks_per_collection))
+            ]
+        for name in E5_COLLECTIONS:
+            docs = [
+                SimpleNamespace(
+                    id=i,
+                    fields={"document_name": f"{name}.pdf", "header": text[:80], "text": text, "pictures": ""},
+                )
+                for i, text in enumerate(_sample_chunks(rng, chunks_per_collection))
+            ]
+            self._collections[name] = docs
+            # Эмбеддинг по заголовку, чтобы длина чанка не влияла на ранжирование
+            self._vectors[name] = np.array([hashed_embedding(doc.fields["header"]) for doc in docs], dtype=np.float32)
+
+    def on_reload(self, callback: Callable[[str], None]) -> None:
+        pass
+
+    def preload(self, collection_names: Sequence[str]) -> None:
+        pass
+
+    def search(self, collection_name: str, data, limit: int = 5, output_fields=(), **kwargs):
+        time.sleep(self.latency)
+        docs = self._collections[collection_name]
+        query = data[0]
+        if isinstance(query, str):
+            words = set(tokenize(query))
+            scores = np.array([len(words & doc.words) / (1 + len(doc.words)) ** 0.5 for doc in docs])
+        else:
+            scores = self._vectors[collection_name] @ np.asarray(query, dtype=np.float32)
+
+        top = np.argsort(-scores)[:limit]
+        hits = [
+            SimpleNamespace(
+                id=docs[i].id,
+                score=float(scores[i]),
+                fields={field: docs[i].fields.get(field, "") for field in output_fields},
+            )
+            for i in top
+        ]
+        return [hits]
+
+
+class MemoryCollection:
+    """Коллекция MongoDB в памяти с задержкой записи."""
+
+    def __init__(self, write_latency: float = 0.0) -> None:
+        self.write_latency = write_latency
+        self.documents: List[dict] = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, documents: List[dict], ordered: bool = True):
+        time.sleep(self.write_latency)
+        with self._lock:
+            self.documents.extend(documents)
+
+    def insert_one(self, document: dict):
+        self.insert_many([document])
+
+
+class MemoryMongoClient:
+    """Заглушка MongoClient для логов: client[db].get_collection(...)."""
+
+    def __init__(self, write_latency: float = 0.0) -> None:
+        self.write_latency = write_latency
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, database: str) -> "MemoryMongoClient":
+        return self
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self._collections.setdefault(name, MemoryCollection(self.write_latency))
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,294 @@
+"""
+Нагрузочный бенчмарк SupplierHandler.ahandle_prompt без внешних сервисов.
+
+vLLM заменяется OpenAI-совместимым сервером-заглушкой (benchmarks/fake_llm.py, отдельный процесс),
+Milvus и модель эмбеддингов — поиском в памяти (benchmarks/fakes.py), MongoDB — коллекцией в памяти
+и MemorySaver в качестве чекпоинтера. N пользователей параллельно отправляют запросы; в отчёте
+p50/p95/p99 по нодам графа, вызовам LLM, поиску Milvus и запросу целиком, RPS и память процесса.
+Результаты сохраняются в JSON для сравнения между коммитами.
+
+Запуск (из каталога src):
+    python -m benchmarks.run --users 16 --requests 10 [--compare benchmarks/results/<file>.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import psutil
+
+from benchmarks.fake_llm import FakeLLMSettings, serve
+
+logger = logging.getLogger("benchmark")
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Fake LLM server did not start on port {port}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class MemorySampler:
+    """Периодически замеряет RSS процесса, чтобы получить пиковое значение за прогон."""
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.process = psutil.Process()
+        self.interval = interval
+        self.start_mb = self._rss()
+        self.peak_mb = self.start_mb
+
+    def _rss(self) -> float:
+        return self.process.memory_info().rss / 2**20
+
+    async def run(self) -> None:
+        while True:
+            self.peak_mb = max(self.peak_mb, self._rss())
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> Dict[str, float]:
+        end_mb = self._rss()
+        return {
+            "start_mb": round(self.start_mb, 1),
+            "peak_mb": round(max(self.peak_mb, end_mb), 1),
+            "end_mb": round(end_mb, 1),
+        }
+
+
+def build_handler(args: argparse.Namespace):
+    # Модули проекта импортируются после подмены CLIENT_URL, т.к. адрес LLM читается из config при импорте
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from benchmarks.fakes import FakeEmbeddingModel, FakeMilvusPool, MemoryMongoClient
+    from config import (
+        ADMISSION_MAX_IN_FLIGHT,
+        ADMISSION_MAX_QUEUE,
+        ADMISSION_QUEUE_TIMEOUT,
+        APP_LLM_NAME,
+        MAX_LEN_USER_PROMPT,
+        MONGO_DB_PATH,
+    )
+    from handler import SupplierHandler, SupplierOptions
+    from nodes.embeddings import QueryEmbeddings
+    from protection import AdmissionController, ExceedingProtector, ProtectorsAccumulator
+    from runnables import createSupplierRunnablesVLLM
+
+    pool = FakeMilvusPool(latency=args.milvus_latency, chunks_per_collection=args.chunks)
+    runnables = createSupplierRunnablesVLLM(
+        llm_name=APP_LLM_NAME,
+        embeddings=QueryEmbeddings(model=FakeEmbeddingModel(latency=args.embedding_latency)),
+        milvus_pool=pool,
+        fused_understanding=args.fused_understanding,
+    )
+    handler = SupplierHandler(
+        SupplierOptions(llm_name=APP_LLM_NAME, psycopg_checkpointer=MONGO_DB_PATH),
+        mongo_client=MemoryMongoClient(write_latency=args.mongo_latency),
+        runnables=runnables,
+        checkpointer=MemorySaver(),
+        milvus_pool=pool,
+        # Без ограничения частоты по чату: пользователи бенчмарка шлют запросы без пауз
+        protector=ProtectorsAccumulator(
+            protectors=[ExceedingProtector(max_len=MAX_LEN_USER_PROMPT)],
+            admission=AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+        ),
+    )
+    return handler
+
+
+async def run_load(handler, args: argparse.Namespace) -> Dict:
+    from benchmarks.fakes import SAMPLE_QUERIES
+    from monitoring.instruments import LLM_LATENCY, LLM_TTFT, MILVUS_SEARCH_LATENCY, NODE_LATENCY
+
+    samples: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    NODE_LATENCY.add_listener(lambda value, labels: samples["nodes"][labels["node"]].append(value))
+    LLM_LATENCY.add_listener(lambda value, labels: samples["llm"][labels["chain"]].append(value))
+    LLM_TTFT.add_listener(lambda value, labels: samples["llm_ttft"][labels["chain"]].append(value))
+    MILVUS_SEARCH_LATENCY.add_listener(lambda value, labels: samples["milvus"][labels["collection"]].append(value))
+
+    end_to_end: List[float] = []
+    errors = 0
+    rejected = 0
+    rng = random.Random(args.seed)
+
+    async def user(user_index: int) -> None:
+        nonlocal errors, rejected
+        for request_index in range(args.requests):
+            query = rng.choice(SAMPLE_QUERIES)
+            if args.unique_queries:
+                query = f"{query} (вопрос {user_index}-{request_index})"
+            start = time.perf_counter()
+            try:
+                result = await handler.ahandle_prompt(query, f"bench-user-{user_index}")
+                # Отказ защиты (перегрузка, rate limit, длина) возвращается строкой, ответ — парой (ответ, значение);
+                # отказы не входят в задержки и RPS, иначе перегруженный прогон выглядит быстрым
+                if isinstance(result, str):
+                    rejected += 1
+                else:
+                    end_to_end.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                logger.error(f"Request failed: {e}")
+            if args.think_time:
+                await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+
+    # Прогрев: сборка графа, первые подключения к заглушке LLM
+    await handler.ahandle_prompt("Как подать заявку?", "bench-warmup")
+    for group in samples.values():
+        group.clear()
+
+    memory = MemorySampler()
+    sampler = asyncio.create_task(memory.run())
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(args.users)))
+    duration = time.perf_counter() - started
+    sampler.cancel()
+
+    total = len(end_to_end) + errors + rejected
+    return {
+        "requests": total,
+        "errors": errors,
+        "rejected": rejected,
+        "duration_s": round(duration, 3),
+        "rps": round(len(end_to_end) / duration, 3) if duration else 0.0,
+        "end_to_end": percentiles(end_to_end),
+        **{
+            group: {name: percentiles(values) for name, values in sorted(items.items())}
+            for group, items in samples.items()
+        },
+        "memory": memory.report(),
+    }
+
+
+def compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def delta(name: str, new: Optional[float], old: Optional[float]) -> None:
+        if new is None or old is None:
+            return
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"  {name:<40} {old:>10.2f} -> {new:>10.2f} ({change:+.1f}%)")
+
+    print(f"Сравнение с {baseline_path} ({baseline.get('git_commit')}):")
+    delta("rps", current["rps"], baseline.get("rps"))
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        delta(f"end_to_end.{key}", current["end_to_end"].get(key), baseline.get("end_to_end", {}).get(key))
+    for node, stats in current.get("nodes", {}).items():
+        delta(f"nodes.{node}.p95_ms", stats.get("p95_ms"), baseline.get("nodes", {}).get(node, {}).get("p95_ms"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load benchmark of SupplierHandler with local stand-ins")
+    parser.add_argument("--users", type=int, default=8, help="одновременных пользователей")
+    parser.add_argument("--requests", type=int, default=10, help="запросов на пользователя")
+    parser.add_argument("--think-time", type=float, default=0.0, help="средняя пауза между запросами, с")
+    parser.add_argument(
+        "--unique-queries", action="store_true", help="делать запросы уникальными (без попаданий в кэши)"
+    )
+    parser.add_argument("--no-answer-cache", dest="answer_cache", action="store_false")
+    parser.add_argument(
+        "--fused-understanding", action="store_true", help="перефраз и классификация одним вызовом LLM (understand)"
+    )
+    parser.add_argument("--llm-ttft", type=float, default=0.2)
+    parser.add_argument("--llm-token-latency", type=float, default=0.02)
+    parser.add_argument("--llm-answer-tokens", type=int, default=120)
+    parser.add_argument("--milvus-latency", type=float, default=0.01)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--mongo-latency", type=float, default=0.002)
+    parser.add_argument("--chunks", type=int, default=200, help="чанков в каждой коллекции")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="метка прогона в имени файла результатов")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--compare", help="JSON с результатами предыдущего прогона")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    port = free_port()
+    settings = FakeLLMSettings(
+        ttft=args.llm_ttft, token_latency=args.llm_token_latency, answer_tokens=args.llm_answer_tokens
+    )
+    server = multiprocessing.Process(target=serve, args=("127.0.0.1", port, settings), daemon=True)
+    server.start()
+    try:
+        wait_for_port(port)
+        os.environ["CLIENT_URL"] = f"http://127.0.0.1:{port}/v1"
+        # Кэш ответов в сервисе выключен по умолчанию, бенчмарк включает его явно (см. --no-answer-cache)
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+        handler = build_handler(args)
+        results = asyncio.run(run_load(handler, args))
+    finally:
+        server.terminate()
+        server.join()
+
+    results = {
+        "label": args.label,
+        "git_commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        **results,
+    }
+
+    summary_keys = ("requests", "errors", "rejected", "rps", "end_to_end", "memory")
+    print(json.dumps({key: results[key] for key in summary_keys}, indent=2))
+    for node, stats in results.get("nodes", {}).items():
+        print(
+            f"  {node:<16} p50 {stats['p50_ms']:>9.1f} ms  p95 {stats['p95_ms']:>9.1f} ms  p99 {stats['p99_ms']:>9.1f} ms"
+        )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    suffix = f"_{args.label}" if args.label else ""
+    path = os.path.join(args.output_dir, f"{datetime.now():%Y%m%d-%H%M%S}_{results['git_commit']}{suffix}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены: {path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
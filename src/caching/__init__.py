@@ -0,0 +1,13 @@
+from caching.embedding import DiskEmbeddingStore, EmbeddingCache, normalize_query
+from caching.lru import LRUCache
+from caching.semantic import SemanticAnswerCache
+from caching.singleflight import SingleFlight
+
+__all__ = [
+    "DiskEmbeddingStore",
+    "EmbeddingCache",
+    "LRUCache",
+    "SemanticAnswerCache",
+    "SingleFlight",
+    "normalize_query",
+]
@@ -0,0 +1,206 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Нормализует текст запроса для использования в качестве ключа кэша."""
+    return " ".join(text.lower().split())
+
+
+class DiskEmbeddingStore:
+    """
+    Дисковый уровень кэша эмбеддингов: memory-mapped массив float32 фиксированной ёмкости
+    и JSON-индекс «ключ -> (слот, время записи)». Слоты переиспользуются по кругу,
+    поэтому файл не растёт, а самые старые записи вытесняются.
+    """
+
+    def __init__(self, path: str, capacity: int, ttl: float, flush_every: int = 100) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.flush_every = flush_every
+        self._vectors_path = os.path.join(path, "embeddings.f32")
+        self._index_path = os.path.join(path, "index.json")
+        self._vectors: Optional[np.memmap] = None
+        self._index: Dict[str, Tuple[int, float]] = {}
+        self._slots: List[Optional[str]] = [None] * capacity
+        self._next_slot = 0
+        self._dim = 0
+        self._dirty = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not (os.path.exists(self._index_path) and os.path.exists(self._vectors_path)):
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["capacity"] != self.capacity:
+                logger.warning("Embedding disk cache capacity changed, starting from scratch")
+                return
+            self._dim = meta["dim"]
+            self._next_slot = meta["next_slot"]
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self._dim))
+            for key, (slot, created_at) in meta["index"].items():
+                self._index[key] = (slot, created_at)
+                self._slots[slot] = key
+            logger.info(f"Embedding disk cache loaded: {len(self._index)} entries from {self.path}")
+        except Exception as e:
+            logger.error(f"Embedding disk cache load failed: {e}")
+            self._index.clear()
+            self._slots = [None] * self.capacity
+            self._vectors = None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        entry = self._index.get(key)
+        if entry is None or self._vectors is None:
+            return None
+        slot, created_at = entry
+        if self.ttl and time.time() - created_at > self.ttl:
+            return None
+        return np.array(self._vectors[slot])
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if self._vectors is None:
+            self._dim = vector.shape[0]
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="w+", shape=(self.capacity, self._dim))
+        if vector.shape[0] != self._dim:
+            return
+
+        slot = self._index[key][0] if key in self._index else self._next_slot
+        if key not in self._index:
+            self._next_slot = (self._next_slot + 1) % self.capacity
+            evicted = self._slots[slot]
+            if evicted is not None:
+                self._index.pop(evicted, None)
+
+        self._vectors[slot] = vector
+        self._index[key] = (slot, time.time())
+        self._slots[slot] = key
+
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._vectors is None or not self._dirty:
+            return
+        self._vectors.flush()
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"capacity": self.capacity, "dim": self._dim, "next_slot": self._next_slot, "index": self._index},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self._index_path)
+        self._dirty = 0
+
+
+class EmbeddingCache:
+    """
+    Ограниченный по числу записей и объёму памяти LRU-кэш эмбеддингов запросов с TTL.
+
+    Ключ — нормализованный текст запроса. При указании disk_path используется дополнительный
+    дисковый уровень (DiskEmbeddingStore), переживающий перезапуск процесса.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        disk_path: str = "",
+        disk_capacity: int = 0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk = DiskEmbeddingStore(disk_path, disk_capacity, ttl) if disk_path and disk_capacity else None
+        if self._disk is not None:
+            atexit.register(self.flush)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = normalize_query(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, created_at = entry
+                if not self.ttl or time.time() - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector.tolist()
+                self._remove(key)
+
+            if self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self._insert(key, vector)
+                    self.disk_hits += 1
+                    return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        key = normalize_query(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._insert(key, vector)
+            if self._disk is not None:
+                self._disk.put(key, vector)
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, embedding)
+        return embedding
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def flush(self) -> None:
+        if self._disk is not None:
+            with self._lock:
+                self._disk.flush()
+
+    def _insert(self, key: str, vector: np.ndarray) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (vector, time.time())
+        self._bytes += vector.nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        vector, _ = self._entries.pop(key)
+        self._bytes -= vector.nbytes
@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    vector: np.ndarray
+    created_at: float
+    buckets: Tuple[int, ...]
+
+
+class SemanticAnswerCache:
+    """
+    Семантический кэш ответов: по эмбеддингу запроса находит ранее отвеченный запрос
+    со сходством не ниже порога и возвращает сохранённый ответ.
+
+    Для поиска кандидатов используется LSH по случайным гиперплоскостям (несколько хеш-таблиц),
+    поэтому поиск не вырождается в полный перебор при росте кэша. Записи вытесняются
+    по TTL и по ёмкости (LRU), кэш сбрасывается целиком при переиндексации базы знаний.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        ttl: float,
+        max_entries: int,
+        n_tables: int = 8,
+        n_bits: int = 12,
+        seed: int = 0,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None
+        self._powers = 1 << np.arange(n_bits, dtype=np.int64)
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(n_tables)]
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding: List[float]) -> Optional[Tuple[str, float]]:
+        """
+        Returns:
+            Optional[Tuple[str, float]]: Сохранённый ответ и сходство либо None, если подходящего запроса нет.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._planes is None or self._planes.shape[2] != vector.shape[0]:
+                self.misses += 1
+                return None
+
+            candidates = set()
+            for table, bucket in zip(self._tables, self._buckets(vector)):
+                candidates.update(table.get(bucket, ()))
+
+            now = time.time()
+            best_id, best_score = None, -1.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if self.ttl and now - entry.created_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(entry.vector, vector))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].answer, best_score
+
+    def store(self, query: str, embedding: List[float], answer: str) -> None:
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._planes is None or self._planes.shape[2] != vector.shape[0]:
+                self._reset(dim=vector.shape[0])
+
+            entry_id = next(self._ids)
+            buckets = self._buckets(vector)
+            self._entries[entry_id] = CachedAnswer(
+                query=query, answer=answer, vector=vector, created_at=time.time(), buckets=buckets
+            )
+            for table, bucket in zip(self._tables, buckets):
+                table.setdefault(bucket, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, reason: str = "") -> None:
+        """Полностью очищает кэш (например, после переиндексации коллекций базы знаний)."""
+        with self._lock:
+            self._entries.clear()
+            self._tables = [{} for _ in range(self.n_tables)]
+        logger.info(f"Semantic answer cache invalidated {reason}".strip())
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _reset(self, dim: int) -> None:
+        self._planes = self._rng.standard_normal((self.n_tables, self.n_bits, dim)).astype(np.float32)
+        self._entries.clear()
+        self._tables = [{} for _ in range(self.n_tables)]
+
+    def _buckets(self, vector: np.ndarray) -> Tuple[int, ...]:
+        bits = (self._planes @ vector) > 0
+        return tuple(int(code) for code in bits.astype(np.int64) @ self._powers)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for table, bucket in zip(self._tables, entry.buckets):
+            ids = table.get(bucket)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del table[bucket]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
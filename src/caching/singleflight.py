@@ -0,0 +1,65 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from monitoring.instruments import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Future) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вычислений (single flight).
+
+    Первый вызов do с ключом запускает вычисление отдельной задачей, остальные вызовы с тем же ключом,
+    пришедшие до его окончания, ждут ту же задачу и получают тот же результат или то же исключение.
+    После завершения ключ освобождается: результат не кэшируется.
+
+    Задача отменяется, только когда отменены все ожидающие её вызовы; отмена одного из них
+    (например, пользователь закрыл чат) не прерывает вычисление для остальных.
+    """
+
+    def __init__(self, scope: str) -> None:
+        self.scope = scope
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Optional[Hashable], fn: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет fn() или присоединяется к уже идущему вычислению с тем же ключом; key=None — без объединения."""
+        if key is None:
+            return await fn()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            SINGLEFLIGHT_CALLS.inc(scope=self.scope, role="leader")
+        else:
+            SINGLEFLIGHT_CALLS.inc(scope=self.scope, role="follower")
+
+        flight.waiters += 1
+        try:
+            # shield: отмена ожидающего не отменяет общую задачу
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Исключение задачи без ожидающих (все отменены) считается обработанным
+        if not flight.task.cancelled():
+            flight.task.exception()
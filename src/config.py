@@ -1,5 +1,5 @@
 import os
-from typing import Final
+from typing import Dict, Final, List
 
 from dotenv import load_dotenv
 
@@ -14,13 +14,13 @@ MAX_LEN_USER_PROMPT: int = int(os.getenv("MAX_LEN_USER_PROMPT", ""))
 
 APP_LLM_NAME: str = "yandex/YandexGPT-5-Lite-8B-instruct"
 LLM_NAME: Final[str] = "yandex/YandexGPT-5-Lite-8B-instruct"
-EMBEDDING_MODEL_NAME: str = "intfloat/multilingual-e5-large"
+EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-large")
 MONGO_DB_PATH: str = f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/"
 
 IMAGES_PATH: Final[str] = "SupplierLLM/data/images"
-CLIENT_URL: Final[str] = "http://83.143.66.61:27363/v1"
-MILVUS_HOST: Final[str] = "83.143.66.65"
-MILVUS_PORT: Final[int] = 27370
+CLIENT_URL: Final[str] = os.getenv("CLIENT_URL", "http://83.143.66.61:27363/v1")
+MILVUS_HOST: Final[str] = os.getenv("MILVUS_HOST", "83.143.66.65")
+MILVUS_PORT: Final[int] = int(os.getenv("MILVUS_PORT", "27370"))
 
 # Nodes
 
@@ -100,10 +100,216 @@ GUID	Statistically Unique Identifier — статистически уникал
 
 ANSWER_NODE_LLM_TEMPERATURE: float = 0.7
 
+# Маршрутизация после классификации:
+# "retrieval" - поиск по FAQ и документам, суммаризация и ответ LLM
+# "direct" - ответ LLM без поиска (для простых сообщений)
+# "template" - фиксированный ответ из TEMPLATE_ANSWERS без обращения к LLM
+CLASSIFICATION_ROUTES: Dict[str, str] = {
+    "термин": "retrieval",
+    "проблема": "retrieval",
+    "работа": "retrieval",
+    "нейтрально": "direct",
+    "оператор": "template",
+}
+DEFAULT_CLASSIFICATION_ROUTE: str = "retrieval"
+TEMPLATE_ANSWERS: Dict[str, str] = {
+    "оператор": "Перевожу вас на техническую поддержку.",
+}
+
+# Статусы, показываемые пользователю после завершения ноды (при потоковой обработке запроса)
+NODE_STATUS_MESSAGES: Dict[str, str] = {
+    "paraphrase": "🔎 Ищу информацию в базе знаний...",
+    "understand": "🔎 Ищу информацию в базе знаний...",
+    "fag_search": "📚 Просмотрел FAQ...",
+    "rag_search": "📄 Просмотрел документы портала...",
+    "summary": "✍️ Формирую ответ...",
+}
+
 # rag_chain.py
 # Список коллекций с E5 эмбеддингами
 E5_COLLECTIONS = ["supplier_e5", "customer_e5", "electronic_aktirovanie_e5", "reglament_e5"]
 
+# paraphrase.py
+# Локальная нормализация запроса: при уверенном результате перефраз через LLM не выполняется
+PARAPHRASE_LOCAL_ENABLED: bool = os.getenv("PARAPHRASE_LOCAL_ENABLED", "false").lower() == "true"
+PARAPHRASE_MAX_CORRECTIONS: int = 1  # допустимое число исправленных опечаток для локального результата
+# Исправление опечатки не снимает уверенность, только если исправленное слово частое и не короткое
+# (частота по словарю pyspellchecker; 300 — примерно верхняя четверть словаря)
+PARAPHRASE_CORRECTION_MIN_FREQUENCY: int = 300
+PARAPHRASE_CORRECTION_MIN_LENGTH: int = 5
+PARAPHRASE_CACHE_SIZE: int = 10000  # ранее перефразированные запросы
+# Варианты написания терминов -> каноническая форма
+QUERY_TERM_ALIASES: Dict[str, str] = {
+    "44 фз": "44-ФЗ",
+    "44фз": "44-ФЗ",
+    "фз 44": "44-ФЗ",
+    "фз-44": "44-ФЗ",
+    "223 фз": "223-ФЗ",
+    "223фз": "223-ФЗ",
+    "фз 223": "223-ФЗ",
+    "фз-223": "223-ФЗ",
+    "эцп": "ЭП",
+    "кэп": "УКЭП",
+    "пп": "Портал поставщиков",
+}
+# Слова предметной области, которых нет в словаре pyspellchecker (словоформы распознаются по основе)
+QUERY_DOMAIN_VOCABULARY: List[str] = [
+    "тендер",
+    "закупка",
+    "госзакупка",
+    "госконтракт",
+    "аккредитация",
+    "аккредитоваться",
+    "котировочный",
+    "котировка",
+    "поставщик",
+    "заказчик",
+    "заявка",
+    "извещение",
+    "электронный",
+    "площадка",
+    "портал",
+    "аукцион",
+    "конкурс",
+    "оферта",
+    "спецсчёт",
+    "регистрация",
+    "зарегистрироваться",
+    "подписание",
+    "сертификат",
+    "росэлторг",
+    "актирование",
+]
+# Аббревиатуры, раскрываемые в запросе (как в примерах промпта перефраза)
+QUERY_ABBREVIATIONS: Dict[str, str] = {
+    "НМЦК": "начальная (максимальная) цена контракта",
+    "ЭТП": "электронная торговая площадка",
+    "ЕИС": "единая информационная система в сфере закупок",
+    "КТРУ": "каталог товаров, работ и услуг",
+    "СТЕ": "стандартная товарная единица",
+    "УКЭП": "усиленная квалифицированная электронная подпись",
+    "ЭП": "электронная подпись",
+    "ЛКП": "личный кабинет поставщика",
+}
+
+# classification.py
+# Локальный классификатор (scripts/train_classifier.py); без файла модели используется только LLM
+CLASSIFIER_MODEL_PATH: str = os.getenv("CLASSIFIER_MODEL_PATH", "data/classifier.joblib")
+CLASSIFIER_CONFIDENCE_THRESHOLD: float = 0.85  # ниже порога категорию определяет LLM
+
 # faq_chain.py
 # Список коллекций для поиска
 COLLECTIONS = ["FAQ_tender_bm25", "articles_bm25"]
+
+# Параллельный поиск по коллекциям Milvus
+MILVUS_SEARCH_MAX_WORKERS: int = 8
+MILVUS_SEARCH_TIMEOUT: float = 3.0  # секунды; не ответившая коллекция исключается из выдачи
+
+# Гибридный поиск (hybrid_chain.py)
+# separate — BM25 и E5 двумя нодами графа (по умолчанию); hybrid — одной нодой с объединением выдачи через RRF
+RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "separate")
+HYBRID_RRF_K: int = 60  # сглаживание RRF: score = weight / (k + rank)
+HYBRID_WEIGHTS = {"bm25": 1.0, "e5": 1.0}  # вес каждого вида поиска в RRF
+HYBRID_TOP_K: int = 10  # столько же чанков, сколько раньше давали FAQ (5) и RAG (5) вместе
+HYBRID_MIN_SCORE: float = 0.0  # порог по score RRF; 0 — без отсечения
+
+# Бэкенд поиска: milvus — сервер Milvus; local — снимок коллекций в памяти процесса
+# (nodes/local_index.py, снимок создаёт scripts/export_local_index.py)
+RETRIEVAL_BACKEND: str = os.getenv("RETRIEVAL_BACKEND", "milvus")
+LOCAL_INDEX_PATH: str = os.getenv("LOCAL_INDEX_PATH", "data/local_index")
+LOCAL_BM25_K1: float = 1.2  # параметры BM25 как у Milvus по умолчанию
+LOCAL_BM25_B: float = 0.75
+
+# Постоянное подключение к Milvus
+MILVUS_ALIAS: Final[str] = "supplier_assistant"
+MILVUS_HEALTH_CHECK_INTERVAL: float = 30.0  # секунды; 0 отключает фоновую проверку
+
+# Summary node
+SUMMARY_MAX_CONCURRENCY: int = 5  # максимум одновременных запросов суммаризации на один запрос пользователя
+SUMMARY_MIN_CHUNK_LENGTH: int = 600  # чанки длиннее суммаризируются
+SUMMARY_MAX_CHUNK_CONTEXT: int = 2000  # сколько символов чанка передаётся в LLM для суммаризации
+# Заранее посчитанные суммаризации чанков (scripts/precompute_summaries.py)
+CHUNK_SUMMARY_STORE_PATH: str = os.getenv("CHUNK_SUMMARY_STORE_PATH", "data/chunk_summaries.sqlite")
+# Суммаризировать через LLM чанки, для которых нет готовой суммаризации
+SUMMARY_ONLINE_FALLBACK: bool = os.getenv("SUMMARY_ONLINE_FALLBACK", "true").lower() == "true"
+
+# Модель эмбеддингов запросов (embeddings.py, embedding_backends.py)
+# hf — эталон fp32 через HuggingFaceEmbeddings; torch-int8 и onnx — CPU-бэкенды для узлов без GPU
+EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "hf")
+EMBEDDING_DEVICE: str = os.getenv("EMBEDDING_DEVICE", "cuda:0")  # для hf; без CUDA используется cpu
+# Префикс E5 перед запросом ("query: "); должен совпадать с тем, как индексировались коллекции
+EMBEDDING_QUERY_PREFIX: str = os.getenv("EMBEDDING_QUERY_PREFIX", "")
+# Файл ONNX внутри каталога модели (например, onnx/model_qint8_avx2.onnx); пусто — экспорт при загрузке
+EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")
+
+# Кэш эмбеддингов запросов (rag_chain.py)
+EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+EMBEDDING_CACHE_TTL: float = 7 * 24 * 3600  # секунды; 0 — без ограничения
+# Каталог дискового уровня кэша (memory-mapped float32); пустая строка отключает его
+EMBEDDING_CACHE_DISK_PATH: str = os.getenv("EMBEDDING_CACHE_DISK_PATH", "")
+EMBEDDING_CACHE_DISK_CAPACITY: int = 100000
+
+# Семантический кэш ответов (handler.py)
+SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD: float = 0.97  # косинусное сходство E5, начиная с которого запросы считаются одинаковыми
+SEMANTIC_CACHE_TTL: float = 24 * 3600  # секунды
+SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+SEMANTIC_CACHE_LSH_TABLES: int = 8
+SEMANTIC_CACHE_LSH_BITS: int = 12
+
+# Буферизованная запись логов в MongoDB (storage/log_sink.py)
+LOG_SINK_BATCH_SIZE: int = 100  # записей в одном insert_many
+LOG_SINK_FLUSH_INTERVAL: float = 1.0  # секунды; неполная пачка записывается не реже
+LOG_SINK_MAX_QUEUE: int = 10000  # при переполнении очереди записи уходят в spill-файл (из фонового потока)
+LOG_SINK_RETRY_INTERVAL: float = 30.0  # секунды между попытками дозаписать spill-файл
+# Локальный файл для логов, которые не удалось записать в MongoDB (JSON Lines, extended JSON)
+LOG_SINK_SPILL_PATH: str = os.getenv("LOG_SINK_SPILL_PATH", "data/logs_spill.jsonl")
+
+# Общий пул подключений к MongoDB (storage/mongo.py): один клиент на процесс для всех компонентов
+MONGO_APP_NAME: str = "supplier-assistant"
+MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS: int = 60000
+MONGO_CONNECT_TIMEOUT_MS: int = 5000
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+MONGO_SOCKET_TIMEOUT_MS: int = 10000
+MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 2000  # сколько ждать свободного соединения из пула
+# Write concern для логов: 1 — с подтверждением записи, 0 — без ожидания ответа сервера
+MONGO_LOG_WRITE_CONCERN: int = int(os.getenv("MONGO_LOG_WRITE_CONCERN", "1"))
+
+# Распознавание речи (speech/)
+WHISPER_MODEL_NAME: str = os.getenv("WHISPER_MODEL_NAME", "turbo")
+WHISPER_LANGUAGE: str = os.getenv("WHISPER_LANGUAGE", "ru")  # пустая строка — автоопределение языка
+AUDIO_SAMPLE_RATE: int = 24000  # частота записи в браузере ([features.audio] в .chainlit/config.toml)
+WHISPER_MAX_WORKERS: int = 1  # потоков распознавания (модель одна, на GPU параллельность не даёт выигрыша)
+WHISPER_MAX_QUEUE: int = 8  # сверх этого числа ожидающих записей новые отклоняются
+# Потоковое распознавание: окна такой длины распознаются в фоне, пока пользователь говорит; 0 — только в конце
+WHISPER_STREAMING_WINDOW_SECONDS: float = float(os.getenv("WHISPER_STREAMING_WINDOW_SECONDS", "10"))
+AUDIO_MAX_SECONDS: float = 120.0  # размер кольцевого буфера записи на сессию
+
+# Запуск приложения (startup.py)
+# true — модели и коллекции загружаются фоновым прогревом, сервер принимает подключения сразу;
+# false — прогрев выполняется при импорте app.py, до старта сервера
+LAZY_STARTUP: bool = os.getenv("LAZY_STARTUP", "true").lower() == "true"
+STARTUP_READY_TIMEOUT: float = 300.0  # сколько запрос ждёт окончания прогрева, с
+
+# Защита от перегрузки (protection/)
+# Ограничение частоты запросов одного чата: токен-бакет со средней скоростью и запасом на всплеск
+RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))  # 0 — без ограничения
+RATE_LIMIT_BURST: int = 5
+RATE_LIMIT_MAX_CHATS: int = 100000  # столько бакетов хранится, давно неактивные вытесняются
+# Допуск к обработке: не больше MAX_IN_FLIGHT запросов одновременно, остальные ждут в очереди
+ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # сверх этого запрос сразу отклоняется
+ADMISSION_QUEUE_TIMEOUT: float = 30.0  # секунды ожидания в очереди
+
+# Объединение одинаковых одновременных запросов (caching/singleflight.py)
+# Одинаковые (после нормализации) запросы того же чата и одинаковые вызовы цепочек графа (с той же историей),
+# пришедшие во время уже идущей обработки, ждут её результат вместо повторных обращений к vLLM и Milvus
+SINGLEFLIGHT_ENABLED: bool = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# understand.py
+# true — перефраз и классификация выполняются одним вызовом LLM с JSON-ответом (нода understand)
+# вместо двух последовательных нод paraphrase и classification
+UNDERSTAND_FUSED: bool = os.getenv("UNDERSTAND_FUSED", "false").lower() == "true"
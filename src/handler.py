@@ -1,13 +1,47 @@
-from langgraph.checkpoint.mongodb import MongoDBSaver
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from pymongo import MongoClient
 from requests.auth import _basic_auth_str
 
 from assistant_graph import SupplierAssistant
-from config import MAX_LEN_USER_PROMPT
-from protection import ExceedingProtector, ProtectionStatus, ProtectorsAccumulator
+from caching import SemanticAnswerCache, SingleFlight, normalize_query
+from config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    COLLECTIONS,
+    E5_COLLECTIONS,
+    MAX_LEN_USER_PROMPT,
+    NODE_STATUS_MESSAGES,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_CHATS,
+    RATE_LIMIT_PER_MINUTE,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_LSH_BITS,
+    SEMANTIC_CACHE_LSH_TABLES,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SINGLEFLIGHT_ENABLED,
+)
+from monitoring.instruments import REQUEST_LATENCY, REQUEST_TTFT, REQUESTS
+from nodes.milvus_pool import MilvusCollectionPool, get_retrieval_pool
+from protection import (
+    AdmissionController,
+    ExceedingProtector,
+    ProtectionStatus,
+    ProtectorsAccumulator,
+    RateLimitProtector,
+)
 from protection.base import BaseHandler
-from runnables import createSupplierRunnablesVLLM
+from runnables import SupplierRunnablesVLLM, createSupplierRunnablesVLLM
+from storage import get_async_mongo_client, get_mongo_client
 
 
 class SupplierOptions(BaseModel):
@@ -17,28 +51,244 @@ class SupplierOptions(BaseModel):
 
 class SupplierHandler(BaseHandler):
 
-    def __init__(self, options: SupplierOptions) -> None:
-        self._Supplier_runnables = createSupplierRunnablesVLLM(
+    def __init__(
+        self,
+        options: SupplierOptions,
+        mongo_client: Optional[MongoClient] = None,
+        async_mongo_client: Optional[AsyncIOMotorClient] = None,
+        runnables: Optional[SupplierRunnablesVLLM] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        milvus_pool: Optional[MilvusCollectionPool] = None,
+        protector: Optional[ProtectorsAccumulator] = None,
+    ) -> None:
+        # Зависимости можно передать явно (тесты, бенчмарк), иначе создаются рабочие
+        self._Supplier_runnables = runnables or createSupplierRunnablesVLLM(
             llm_name=options.llm_name,
             headers={"Authorization": _basic_auth_str("admin", "password")},
         )
         self._checkpointer_db_uri = options.psycopg_checkpointer
-        self._protector = ProtectorsAccumulator(protectors=[ExceedingProtector(max_len=MAX_LEN_USER_PROMPT)])
-        self.mongodb_client = MongoClient(self._checkpointer_db_uri)
-        self.checkpointer = MongoDBSaver(self.mongodb_client)
-        self.assistant = SupplierAssistant(
-            Supplier_runnables=self._Supplier_runnables,
-            checkpointer=self.checkpointer,
+        # Клиенты MongoDB общие для процесса (storage/mongo.py); можно передать свои, например в тестах
+        self.mongo_client = mongo_client or get_mongo_client(self._checkpointer_db_uri)
+        self.mongodb_client = async_mongo_client
+        self.checkpointer = checkpointer
+        self._milvus_pool = milvus_pool or get_retrieval_pool()
+        # Проверки запроса, ограничение частоты по чату и допуск не больше ADMISSION_MAX_IN_FLIGHT запросов одновременно
+        self._protector = protector or ProtectorsAccumulator(
+            protectors=[
+                ExceedingProtector(max_len=MAX_LEN_USER_PROMPT),
+                RateLimitProtector(
+                    rate_per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, max_chats=RATE_LIMIT_MAX_CHATS
+                ),
+            ],
+            admission=AdmissionController(
+                max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+                max_queue=ADMISSION_MAX_QUEUE,
+                queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+            ),
         )
+        self._assistant: Optional[SupplierAssistant] = None
 
-    async def ahandle_prompt(self, prompt: str, chat_id: str) -> str:
-        protector_res = self._protector.check(prompt)
-        if protector_res.status is not ProtectionStatus.ok:
-            return protector_res.message
+        # Семантический кэш ответов перед графом; сбрасывается при переиндексации коллекций Milvus
+        self._answer_cache: Optional[SemanticAnswerCache] = None
+        if SEMANTIC_CACHE_ENABLED:
+            self._answer_cache = SemanticAnswerCache(
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl=SEMANTIC_CACHE_TTL,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                n_tables=SEMANTIC_CACHE_LSH_TABLES,
+                n_bits=SEMANTIC_CACHE_LSH_BITS,
+            )
+            self._milvus_pool.on_reload(lambda name: self.invalidate_answer_cache(f"(collection {name} reloaded)"))
+
+        # Одинаковые запросы, пришедшие во время обработки такого же, ждут её ответ вместо повторного запуска графа
+        self._inflight = SingleFlight("request")
+
+    @property
+    def assistant(self) -> SupplierAssistant:
+        # AsyncMongoDBSaver привязывается к запущенному event loop,
+        # поэтому граф собирается при первом обращении уже внутри loop
+        if self._assistant is None:
+            if self.checkpointer is None:
+                if self.mongodb_client is None:
+                    self.mongodb_client = get_async_mongo_client(self._checkpointer_db_uri)
+                # Используем те же коллекции, что и синхронный MongoDBSaver, чтобы сохранить историю диалогов
+                self.checkpointer = AsyncMongoDBSaver(
+                    self.mongodb_client,
+                    checkpoint_collection_name="checkpoints",
+                    writes_collection_name="checkpoint_writes",
+                )
+            self._assistant = SupplierAssistant(
+                Supplier_runnables=self._Supplier_runnables,
+                checkpointer=self.checkpointer,
+                mongo_client=self.mongo_client,
+            )
+        return self._assistant
+
+    def warm_up_steps(self) -> List[Tuple[str, Callable[[], Any]]]:
+        """Шаги прогрева для startup.Startup: первый эмбеддинг, загрузка коллекций Milvus, подключение к MongoDB."""
+        return [
+            ("embeddings", self._Supplier_runnables.embeddings.warm_up),
+            ("milvus", lambda: self._milvus_pool.preload(COLLECTIONS + E5_COLLECTIONS)),
+            ("mongo", lambda: self.mongo_client.admin.command("ping")),
+        ]
+
+    def invalidate_answer_cache(self, reason: str = "") -> None:
+        """Сбрасывает семантический кэш ответов, например после переиндексации базы знаний."""
+        if self._answer_cache is not None:
+            self._answer_cache.invalidate(reason)
+
+    async def _alookup_answer(self, prompt: str, chat_id: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Ищет ответ на семантически совпадающий запрос в кэше.
+
+        Returns:
+            Tuple[Optional[str], Optional[List[float]]]: Ответ из кэша (или None) и эмбеддинг запроса для сохранения.
+        """
+        if self._answer_cache is None:
+            return None, None
 
+        embedding = await self._Supplier_runnables.embeddings.aembed_query(prompt)
+        cached = self._answer_cache.lookup(embedding)
+        if cached is None:
+            return None, embedding
+
+        answer, score = cached
+        await self.assistant._asave_flat_log(chat_id, "semantic_cache", prompt, f"Ответ из кэша, сходство {score:.3f}")
+        return answer, embedding
+
+    def _store_answer(self, prompt: str, embedding: Optional[List[float]], answer: str) -> None:
+        if self._answer_cache is not None and embedding is not None and answer:
+            self._answer_cache.store(prompt, embedding, answer)
+
+    @staticmethod
+    def _observe_request(source: str, start: float) -> None:
+        REQUESTS.inc(source=source)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, source=source)
+
+    @staticmethod
+    def _flight_key(prompt: str, chat_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Ключ объединения запросов: чат и нормализованный запрос. Граф хранит историю и ход диалога
+        в состоянии чата, поэтому объединяются только повторы в том же чате (например, двойная отправка);
+        одинаковые запросы разных чатов объединяются на уровне цепочек графа (см. CoalescingRunnable).
+        """
+        return (chat_id, normalize_query(prompt)) if SINGLEFLIGHT_ENABLED else None
+
+    async def _ainvoke_graph(self, prompt: str, chat_id: str, embedding: Optional[List[float]]) -> str:
+        config = {"configurable": {"thread_id": chat_id}}
+        output = await self.assistant.graph.ainvoke({"query": prompt, "user_id": chat_id}, config=config)
+        if output.get("answer_cacheable"):
+            self._store_answer(prompt, embedding, output["final_output"])
+        return output["final_output"]
+
+    async def _astream_graph(
+        self, prompt: str, chat_id: str, embedding: Optional[List[float]], emit: Callable[[Dict[str, str]], None]
+    ) -> str:
+        """Выполняет граф потоково, передавая события status и token в emit; возвращает итоговый ответ."""
         config = {"configurable": {"thread_id": chat_id}}
-        output = self.assistant.graph.invoke({"query": prompt, "user_id": chat_id}, config=config)
-        answer = output["final_output"]
-        value = output["final_output"]
+        final_output = ""
+        cacheable = False
+        async for mode, chunk in self.assistant.graph.astream(
+            {"query": prompt, "user_id": chat_id}, config=config, stream_mode=["updates", "custom"]
+        ):
+            if mode == "custom":
+                emit({"type": "token", "content": chunk["token"]})
+                continue
+
+            for node, update in chunk.items():
+                if update and "final_output" in update:
+                    final_output = update["final_output"]
+                    cacheable = bool(update.get("answer_cacheable"))
+                if node in NODE_STATUS_MESSAGES:
+                    emit({"type": "status", "content": NODE_STATUS_MESSAGES[node]})
+
+        if cacheable:
+            self._store_answer(prompt, embedding, final_output)
+        return final_output
+
+    async def _alog_coalesced(self, prompt: str, chat_id: str) -> None:
+        await self.assistant._asave_flat_log(chat_id, "singleflight", prompt, "Ответ одновременного такого же запроса")
+
+    async def ahandle_prompt(self, prompt: str, chat_id: str) -> str:
+        start = time.perf_counter()
+        # Слот обработки занят до конца запроса, включая поиск в кэше и граф
+        async with self._protector.admit(prompt, chat_id) as protector_res:
+            if protector_res.status is not ProtectionStatus.ok:
+                self._observe_request("rejected", start)
+                return protector_res.message
+
+            cached_answer, embedding = await self._alookup_answer(prompt, chat_id)
+            if cached_answer is not None:
+                self._observe_request("cache", start)
+                return cached_answer, cached_answer
+
+            # source становится graph, только если граф запустил этот запрос, а не такой же одновременный
+            source = "coalesced"
+
+            def run_graph():
+                nonlocal source
+                source = "graph"
+                return self._ainvoke_graph(prompt, chat_id, embedding)
+
+            answer = await self._inflight.do(self._flight_key(prompt, chat_id), run_graph)
+            if source == "coalesced":
+                await self._alog_coalesced(prompt, chat_id)
+        self._observe_request(source, start)
+        value = answer
         # image_data = output["image_data"] # TODO: FIX IMAGES
         return answer, value
+
+    async def astream_prompt(self, prompt: str, chat_id: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Обрабатывает запрос потоково, отдавая события по мере выполнения графа:
+        - {"type": "status", "content": ...} — завершилась очередная нода
+        - {"type": "token", "content": ...} — очередной токен ответа
+        - {"type": "final", "content": ...} — итоговый ответ
+
+        Запрос, объединённый с таким же одновременным запросом того же чата, получает только итоговый ответ
+        (как из кэша).
+        """
+        start = time.perf_counter()
+        async with self._protector.admit(prompt, chat_id) as protector_res:
+            if protector_res.status is not ProtectionStatus.ok:
+                self._observe_request("rejected", start)
+                yield {"type": "final", "content": protector_res.message}
+                return
+
+            cached_answer, embedding = await self._alookup_answer(prompt, chat_id)
+            if cached_answer is not None:
+                self._observe_request("cache", start)
+                yield {"type": "final", "content": cached_answer}
+                return
+
+            source = "coalesced"
+            events: asyncio.Queue = asyncio.Queue()
+
+            def run_graph():
+                nonlocal source
+                source = "graph"
+                return self._astream_graph(prompt, chat_id, embedding, events.put_nowait)
+
+            # Граф выполняется общей задачей; закрытие генератора (отключение клиента) снимает только это ожидание
+            flight = asyncio.ensure_future(self._inflight.do(self._flight_key(prompt, chat_id), run_graph))
+            try:
+                first_token = True
+                while not flight.done() or not events.empty():
+                    next_event = asyncio.ensure_future(events.get())
+                    await asyncio.wait({next_event, flight}, return_when=asyncio.FIRST_COMPLETED)
+                    if not next_event.done():
+                        next_event.cancel()
+                        continue
+                    event = next_event.result()
+                    if event["type"] == "token" and first_token:
+                        REQUEST_TTFT.observe(time.perf_counter() - start)
+                        first_token = False
+                    yield event
+                final_output = flight.result()
+            finally:
+                flight.cancel()
+            if source == "coalesced":
+                await self._alog_coalesced(prompt, chat_id)
+
+        self._observe_request(source, start)
+        yield {"type": "final", "content": final_output}
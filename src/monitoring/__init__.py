@@ -0,0 +1,12 @@
+from monitoring.instruments import instrument_node, observe_llm
+from monitoring.metrics import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "instrument_node",
+    "observe_llm",
+]
@@ -0,0 +1,35 @@
+from typing import Any, Callable, Dict
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.routing import APIRoute
+
+from monitoring.metrics import REGISTRY, MetricsRegistry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def mount_metrics_endpoint(app: FastAPI, path: str = "/metrics", registry: MetricsRegistry = REGISTRY) -> None:
+    """
+    Добавляет в приложение эндпоинт с метриками в формате Prometheus.
+
+    Маршрут ставится первым: у Chainlit есть маршрут, перехватывающий все пути для фронтенда.
+    """
+
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.router.routes.insert(0, APIRoute(path, metrics, methods=["GET"], include_in_schema=False))
+
+
+def mount_readiness_endpoint(app: FastAPI, status: Callable[[], Dict[str, Any]], path: str = "/ready") -> None:
+    """
+    Добавляет эндпоинт готовности для балансировщика: 200 после прогрева, до этого 503.
+    В теле — статус прогрева (длительности шагов, ошибки).
+    """
+
+    async def ready() -> JSONResponse:
+        payload = status()
+        return JSONResponse(payload, status_code=200 if payload.get("ready") else 503)
+
+    app.router.routes.insert(0, APIRoute(path, ready, methods=["GET"], include_in_schema=False))
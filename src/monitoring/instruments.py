@@ -0,0 +1,106 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from monitoring.metrics import REGISTRY
+
+# Ноды графа SupplierAssistant
+NODE_LATENCY = REGISTRY.histogram("assistant_node_duration_seconds", "Duration of graph nodes", ["node"])
+NODE_ERRORS = REGISTRY.counter("assistant_node_errors_total", "Graph node failures", ["node"])
+
+# Запросы пользователей целиком (source: graph, cache, coalesced, rejected)
+REQUESTS = REGISTRY.counter("assistant_requests_total", "Handled user prompts", ["source"])
+REQUEST_LATENCY = REGISTRY.histogram("assistant_request_duration_seconds", "End-to-end prompt latency", ["source"])
+REQUEST_TTFT = REGISTRY.histogram("assistant_time_to_first_token_seconds", "Prompt to first answer token")
+
+# Поиск по коллекциям Milvus
+MILVUS_SEARCH_LATENCY = REGISTRY.histogram(
+    "milvus_search_duration_seconds", "Milvus search duration per collection", ["collection"]
+)
+MILVUS_SEARCH_ERRORS = REGISTRY.counter(
+    "milvus_search_errors_total", "Failed or timed out Milvus searches", ["collection", "reason"]
+)
+
+# Вызовы LLM по цепочкам (paraphrase, classification, summary, answer)
+LLM_LATENCY = REGISTRY.histogram("llm_request_duration_seconds", "LLM call duration", ["chain"])
+LLM_TTFT = REGISTRY.histogram("llm_time_to_first_token_seconds", "LLM time to first streamed token", ["chain"])
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "LLM tokens by kind (prompt, completion)", ["chain", "kind"])
+LLM_ERRORS = REGISTRY.counter("llm_errors_total", "Failed LLM calls", ["chain"])
+
+# MongoDB: команды (через CommandListener клиента), пул соединений и очередь логов
+MONGO_COMMAND_LATENCY = REGISTRY.histogram("mongo_command_duration_seconds", "MongoDB command duration", ["command"])
+MONGO_COMMAND_ERRORS = REGISTRY.counter("mongo_command_errors_total", "Failed MongoDB commands", ["command"])
+MONGO_POOL_CONNECTIONS = REGISTRY.gauge("mongo_pool_connections", "MongoDB pool connections", ["state"])
+LOG_SINK_WRITTEN = REGISTRY.counter("log_sink_written_total", "Log entries written to MongoDB")
+LOG_SINK_SPILLED = REGISTRY.counter("log_sink_spilled_total", "Log entries spilled to the local file")
+LOG_SINK_DROPPED = REGISTRY.counter("log_sink_dropped_total", "Log entries dropped on overflow")
+LOG_SINK_QUEUE = REGISTRY.gauge("log_sink_queue_size", "Log entries waiting for a flush")
+
+# Защита от перегрузки: отклонённые запросы, занятые слоты и очередь на допуск
+PROTECTION_REJECTIONS = REGISTRY.counter("protection_rejections_total", "Rejected prompts by reason", ["reason"])
+ADMISSION_IN_FLIGHT = REGISTRY.gauge("admission_in_flight", "Prompts being processed")
+ADMISSION_QUEUE = REGISTRY.gauge("admission_queue_size", "Prompts waiting for a processing slot")
+ADMISSION_WAIT = REGISTRY.histogram("admission_wait_seconds", "Time spent waiting for a processing slot")
+
+# Объединение одинаковых одновременных вычислений (scope: request или цепочка; role: leader, follower)
+SINGLEFLIGHT_CALLS = REGISTRY.counter(
+    "singleflight_calls_total", "Calls that started or joined an in-flight computation", ["scope", "role"]
+)
+
+# Запуск: длительность шагов прогрева и готовность принимать запросы
+STARTUP_STEP_DURATION = REGISTRY.gauge(
+    "startup_step_duration_seconds", "Duration of startup and warm-up steps", ["step"]
+)
+STARTUP_READY = REGISTRY.gauge("startup_ready", "1 once the warm-up has finished")
+
+
+def instrument_node(name: str, node: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Оборачивает асинхронную ноду графа замером длительности и счётчиком ошибок."""
+
+    @functools.wraps(node)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await node(*args, **kwargs)
+        except Exception:
+            NODE_ERRORS.inc(node=name)
+            raise
+        finally:
+            NODE_LATENCY.observe(time.perf_counter() - start, node=name)
+
+    return wrapper
+
+
+class LLMCall:
+    """Замер одного вызова LLM: время до первого токена и расход токенов из usage ответа."""
+
+    def __init__(self, chain: str) -> None:
+        self.chain = chain
+        self.start = time.perf_counter()
+        self._first_token_seen = False
+
+    def first_token(self) -> None:
+        if not self._first_token_seen:
+            self._first_token_seen = True
+            LLM_TTFT.observe(time.perf_counter() - self.start, chain=self.chain)
+
+    def record(self, response: Any) -> None:
+        """Учитывает usage ответа (или последнего чанка потока с stream_options include_usage)."""
+        usage: Optional[Any] = getattr(response, "usage", None)
+        if usage is None:
+            return
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, chain=self.chain, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, chain=self.chain, kind="completion")
+
+
+@contextmanager
+def observe_llm(chain: str) -> Iterator[LLMCall]:
+    call = LLMCall(chain)
+    try:
+        yield call
+    except Exception:
+        LLM_ERRORS.inc(chain=chain)
+        raise
+    finally:
+        LLM_LATENCY.observe(time.perf_counter() - call.start, chain=chain)
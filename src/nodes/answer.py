@@ -1,11 +1,12 @@
-from typing import Dict, Optional, TypedDict
+from typing import AsyncIterator, Dict, List, Optional, TypedDict
 
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
 
 from config import ANSWER_NODE_LLM_TEMPERATURE, ANSWER_NODE_SYSTEM_PROMPT, CLIENT_URL, LLM_NAME
+from monitoring import observe_llm
 
 
 class AnswerInput(TypedDict):
@@ -44,29 +45,69 @@ def createAnswerChain(
     )
 
     client = OpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    async_client = AsyncOpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+
+    def build_messages(input_data: AnswerInput) -> List[Dict[str, str]]:
+        prompt = prompt_template.format(
+            system_prompt=ANSWER_NODE_SYSTEM_PROMPT, query=input_data["query"], context=input_data["context"]
+        )
+
+        print("resultresultresult")
+        print(prompt)
+        print("resultresultresult")
+
+        return [
+            {"role": "system", "content": ANSWER_NODE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
 
     class AnswerRunnable(Runnable[AnswerInput, AnswerOutput]):
         def invoke(self, input_data: AnswerInput) -> AnswerOutput:
-            prompt = prompt_template.format(
-                system_prompt=ANSWER_NODE_SYSTEM_PROMPT, query=input_data["query"], context=input_data["context"]
-            )
-
-            print("resultresultresult")
-            print(prompt)
-            print("resultresultresult")
-
-            response = client.chat.completions.create(
-                model=llm_name,
-                messages=[
-                    {"role": "system", "content": ANSWER_NODE_SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt},
-                ],
-                # temperature=temperature,
-                stream=False,
-            )
+            with observe_llm("answer") as call:
+                response = client.chat.completions.create(
+                    model=llm_name,
+                    messages=build_messages(input_data),
+                    # temperature=temperature,
+                    stream=False,
+                )
+                call.record(response)
 
             result = response.choices[0].message.content.strip()
 
             return AnswerOutput(final_output=result)
 
+        async def ainvoke(self, input_data: AnswerInput) -> AnswerOutput:
+            with observe_llm("answer") as call:
+                response = await async_client.chat.completions.create(
+                    model=llm_name,
+                    messages=build_messages(input_data),
+                    # temperature=temperature,
+                    stream=False,
+                )
+                call.record(response)
+
+            result = response.choices[0].message.content.strip()
+
+            return AnswerOutput(final_output=result)
+
+        async def astream(self, input_data: AnswerInput) -> AsyncIterator[str]:
+            """
+            Генерирует ответ потоково, отдавая токены по мере их получения от LLM.
+            """
+            with observe_llm("answer") as call:
+                stream = await async_client.chat.completions.create(
+                    model=llm_name,
+                    messages=build_messages(input_data),
+                    # temperature=temperature,
+                    stream=True,
+                    # Последний чанк потока содержит usage (без choices)
+                    stream_options={"include_usage": True},
+                )
+
+                async for chunk in stream:
+                    call.record(chunk)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        call.first_token()
+                        yield chunk.choices[0].delta.content
+
     return AnswerRunnable()
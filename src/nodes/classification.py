@@ -1,12 +1,14 @@
-from typing import Dict, List, Literal, Optional, TypedDict
+from typing import Any, Dict, List, Literal, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
 
-from config import CLIENT_URL, LLM_NAME
+from config import CLASSIFIER_CONFIDENCE_THRESHOLD, CLIENT_URL, LLM_NAME
+from monitoring import observe_llm
+from nodes.local_classifier import LocalClassifier
 
 
 class ClassificationInput(TypedDict):
@@ -19,11 +21,16 @@ ClassificationType = Literal["термин", "проблема", "работа",
 
 class ClassificationOutput(BaseModel):
     classification: ClassificationType = Field(description="Тип классификации запроса")
+    # fallback — ответ LLM не распознан, категория подставлена по умолчанию
+    source: Literal["llm", "local", "fallback"] = Field(description="Кто определил категорию", default="llm")
+    confidence: Optional[float] = Field(description="Уверенность локального классификатора", default=None)
 
 
 def createClassificationChain(
     llm_name: str = LLM_NAME,
     headers: Optional[Dict[str, str]] = None,
+    local_classifier: Optional[LocalClassifier] = None,
+    confidence_threshold: float = CLASSIFIER_CONFIDENCE_THRESHOLD,
 ) -> Runnable[ClassificationInput, ClassificationOutput]:
     """
     Создаёт цепочку классификации запросов на 5 типов:
@@ -32,6 +39,10 @@ def createClassificationChain(
     - работа: вопросы о документах пользователя
     - оператор: запросы к человеку-оператору
     - нейтрально: простые сообщения
+
+    Если передан локальный классификатор и он уверен в ответе (не ниже confidence_threshold),
+    вызов LLM не выполняется. Если ответ LLM не распознан, возвращается категория "оператор"
+    с source="fallback".
     """
     prompt_template = PromptTemplate.from_template(
         """Классифицируйте пользовательский запрос ровно в одну из 5 категорий:
@@ -55,32 +66,63 @@ def createClassificationChain(
         Категория:"""
     )
 
+    valid_types = {"термин", "проблема", "работа", "оператор", "нейтрально"}
+
     client = OpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    async_client = AsyncOpenAI(api_key="EMPTY", base_url=CLIENT_URL)
 
-    class ClassificationRunnable(Runnable[ClassificationInput, ClassificationOutput]):
-        def invoke(self, input_data: ClassificationInput) -> ClassificationOutput:
-            query = input_data["query"].strip().lower()
+    def build_request(input_data: ClassificationInput) -> Dict[str, Any]:
+        query = input_data["query"].strip().lower()
 
-            prompt = prompt_template.format(query=query)
+        prompt = prompt_template.format(query=query)
 
-            response = client.chat.completions.create(
-                model=llm_name,
-                messages=[
-                    {"role": "system", "content": "Вы помощник для классификации запросов."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.0,
-                max_tokens=10,
-                stream=False,
-            )
+        return dict(
+            model=llm_name,
+            messages=[
+                {"role": "system", "content": "Вы помощник для классификации запросов."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0,
+            max_tokens=10,
+            stream=False,
+        )
 
-            result = response.choices[0].message.content.strip().lower()
+    def parse_response(response) -> ClassificationOutput:
+        result = response.choices[0].message.content.strip().lower()
 
-            # Валидация результата
-            valid_types = {"термин", "проблема", "работа", "оператор", "нейтрально"}
-            if result not in valid_types:
-                result = "оператор"  # значение по умолчанию
+        # Валидация результата
+        if result not in valid_types:
+            return ClassificationOutput(classification="оператор", source="fallback")  # значение по умолчанию
 
-            return ClassificationOutput(classification=result)
+        return ClassificationOutput(classification=result)
+
+    def classify_locally(input_data: ClassificationInput) -> Optional[ClassificationOutput]:
+        if local_classifier is None:
+            return None
+        label, confidence = local_classifier.predict(input_data["query"])
+        if confidence < confidence_threshold or label not in valid_types:
+            return None
+        return ClassificationOutput(classification=label, source="local", confidence=confidence)
+
+    class ClassificationRunnable(Runnable[ClassificationInput, ClassificationOutput]):
+        def invoke(self, input_data: ClassificationInput) -> ClassificationOutput:
+            local_result = classify_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("classification") as call:
+                response = client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return parse_response(response)
+
+        async def ainvoke(self, input_data: ClassificationInput) -> ClassificationOutput:
+            local_result = classify_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("classification") as call:
+                response = await async_client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return parse_response(response)
 
     return ClassificationRunnable()
@@ -0,0 +1,78 @@
+import logging
+from typing import Any, Callable, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_ONNX_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Эмбеддинги напрямую через SentenceTransformer (для бэкендов, которые HuggingFaceEmbeddings не настраивает)."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.encode(texts, convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _resolve_device(device: str) -> str:
+    import torch
+
+    if device.startswith("cuda") and not torch.cuda.is_available():
+        logger.warning(f"CUDA is not available, embeddings fall back from {device} to cpu")
+        return "cpu"
+    return device
+
+
+def load_hf(model_name: str, device: str) -> Embeddings:
+    """Эталон: fp32 (на GPU, если он есть) через langchain HuggingFaceEmbeddings."""
+    from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": _resolve_device(device)})
+
+
+def load_torch_int8(model_name: str, device: str) -> Embeddings:
+    """CPU: динамическое int8-квантование линейных слоёв (веса int8, активации квантуются на лету)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    client = SentenceTransformer(model_name, device="cpu")
+    client = torch.quantization.quantize_dynamic(client, {torch.nn.Linear}, dtype=torch.qint8)
+    return SentenceTransformerEmbeddings(client)
+
+
+def load_onnx(model_name: str, device: str) -> Embeddings:
+    """
+    CPU: ONNX Runtime (нужен optimum[onnxruntime]). Без EMBEDDING_ONNX_FILE модель экспортируется
+    при загрузке; заранее экспортированную (в том числе int8) модель готовит
+    scripts/check_embedding_backends.py --export-onnx.
+    """
+    try:
+        import optimum.onnxruntime  # noqa: F401
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("The onnx embedding backend requires `pip install optimum[onnxruntime]`") from e
+
+    model_kwargs = {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+    client = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    return SentenceTransformerEmbeddings(client)
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[[str, str], Embeddings]] = {
+    "hf": load_hf,
+    "torch-int8": load_torch_int8,
+    "onnx": load_onnx,
+}
+
+
+def load_embedding_model(backend: str, model_name: str, device: str) -> Embeddings:
+    """Загружает модель эмбеддингов выбранного бэкенда (EMBEDDING_BACKEND в config.py)."""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {sorted(EMBEDDING_BACKENDS)}")
+    return EMBEDDING_BACKENDS[backend](model_name, device)
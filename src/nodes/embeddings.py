@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from caching import EmbeddingCache
+from config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_DISK_CAPACITY,
+    EMBEDDING_CACHE_DISK_PATH,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_QUERY_PREFIX,
+)
+from nodes.embedding_backends import load_embedding_model
+
+
+class QueryEmbeddings:
+    """
+    Эмбеддинги пользовательских запросов (E5) с кэшем.
+
+    Общий экземпляр используется RAG-поиском и семантическим кэшем ответов,
+    чтобы модель загружалась в память один раз. Модель загружается при первом обращении
+    (или прогревом при старте приложения), а не при создании объекта.
+
+    Бэкенд модели выбирается в config.py (EMBEDDING_BACKEND); префикс E5 добавляется здесь,
+    одинаково для всех бэкендов, и входит в ключ кэша.
+    """
+
+    def __init__(
+        self,
+        device: str = EMBEDDING_DEVICE,
+        model: Optional[Embeddings] = None,
+        backend: str = EMBEDDING_BACKEND,
+        query_prefix: str = EMBEDDING_QUERY_PREFIX,
+    ) -> None:
+        self.device = device
+        self.backend = backend
+        self.query_prefix = query_prefix
+        # Модель можно передать явно (например, заглушку в бенчмарке)
+        self._model = model
+        self._model_lock = threading.Lock()
+        # Повторяющиеся (после перефраза) запросы не пересчитывают эмбеддинг.
+        # Векторы разных бэкендов немного отличаются, поэтому дисковый кэш у каждого свой
+        self.cache = EmbeddingCache(
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+            ttl=EMBEDDING_CACHE_TTL,
+            disk_path=os.path.join(EMBEDDING_CACHE_DISK_PATH, backend) if EMBEDDING_CACHE_DISK_PATH else "",
+            disk_capacity=EMBEDDING_CACHE_DISK_CAPACITY,
+        )
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_embedding_model(self.backend, EMBEDDING_MODEL_NAME, self.device)
+        return self._model
+
+    def warm_up(self) -> None:
+        """Загружает модель и выполняет первый прямой проход (в обход кэша)."""
+        self.model.embed_query(self.query_prefix + "прогрев")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_compute(self.query_prefix + text, self.model.embed_query)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Модель синхронная, поэтому при промахе кэша эмбеддинг считается в потоке, не блокируя event loop
+        text = self.query_prefix + text
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = await asyncio.to_thread(self.model.embed_query, text)
+            self.cache.put(text, embedding)
+        return embedding
+
+
+def createQueryEmbeddings(device: str = EMBEDDING_DEVICE) -> QueryEmbeddings:
+    """
+    Создаёт модель эмбеддингов запросов с кэшем.
+    """
+    return QueryEmbeddings(device=device)
@@ -1,11 +1,13 @@
-from typing import List, TypedDict
+from functools import partial
+from typing import List, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import Runnable
 from pydantic import BaseModel, Field
-from pymilvus import Collection, connections
 
-from config import COLLECTIONS, MILVUS_HOST, MILVUS_PORT
+from config import COLLECTIONS, LAZY_STARTUP, MILVUS_HOST, MILVUS_PORT, MILVUS_SEARCH_TIMEOUT
+from nodes.milvus_pool import MilvusCollectionPool, get_retrieval_pool
+from nodes.milvus_search import asearch_collections, search_collections
 
 
 class RAGInput(TypedDict):
@@ -19,66 +21,64 @@ class RAGOutput(BaseModel):
     collection_stats: dict = Field(description="Статистика по коллекциям", default_factory=dict)
 
 
+def bm25_search(
+    pool: MilvusCollectionPool, user_query: str, collection_name: str, timeout: float = MILVUS_SEARCH_TIMEOUT
+) -> List[dict]:
+    """Полнотекстовый поиск BM25 по одной коллекции (используется и гибридным поиском)."""
+    # Выполняем поиск в текущей коллекции
+    results = pool.search(
+        collection_name,
+        data=[user_query],
+        anns_field="bm25",
+        param={"metric_type": "BM25"},
+        limit=5,
+        output_fields=["title", "description"],
+        timeout=timeout,
+    )
+
+    # Форматируем результаты для текущей коллекции
+    collection_results = []
+    for hit in results[0]:
+        collection_results.append(
+            {
+                "collection": collection_name,
+                "id": hit.id,
+                "content": hit.fields.get("description", ""),
+                "title": hit.fields.get("title", ""),
+                "score": float(hit.score),
+            }
+        )
+    return collection_results
+
+
 def createFAQChain(
     host: str = MILVUS_HOST,
     port: int = MILVUS_PORT,
+    pool: Optional[MilvusCollectionPool] = None,
 ) -> Runnable[RAGInput, RAGOutput]:
     """
     Создаёт цепочку для поиска релевантных документов в Milvus с использованием BM25.
-    Ищет по всем указанным коллекциям и возвращает топ-5 результатов из объединённых результатов.
+    Параллельно ищет по всем указанным коллекциям и возвращает топ-5 результатов из объединённых результатов.
     """
+    # Подключение и коллекции загружаются один раз: при создании цепочки
+    # или, при ленивом старте, фоновым прогревом приложения (startup.py)
+    pool = pool or get_retrieval_pool(host, port)
+    if not LAZY_STARTUP:
+        pool.preload(COLLECTIONS)
 
     class RAGRunnable(Runnable[RAGInput, RAGOutput]):
         def invoke(self, input_data: RAGInput) -> RAGOutput:
-            user_query = input_data["query"]
-            connections.connect("default", host=host, port=port)
-
-            all_results = []
-            collection_stats = {}
-
-            for collection_name in COLLECTIONS:
-                try:
-                    collection = Collection(collection_name)
-                    collection.load()
-
-                    # Выполняем поиск в текущей коллекции
-                    results = collection.search(
-                        data=[user_query],
-                        anns_field="bm25",
-                        param={"metric_type": "BM25"},
-                        limit=5,
-                        output_fields=["title", "description"],
-                    )
-
-                    # Форматируем результаты для текущей коллекции
-                    collection_results = []
-                    for hit in results[0]:
-                        collection_results.append(
-                            {
-                                "collection": collection_name,
-                                "content": hit.fields.get("description", ""),
-                                "title": hit.fields.get("title", ""),
-                                "score": float(hit.score),
-                            }
-                        )
-
-                    # Сохраняем статистику по коллекции
-                    collection_stats[collection_name] = {
-                        "count": len(collection_results),
-                        "max_score": max([r["score"] for r in collection_results]) if collection_results else 0,
-                    }
-
-                    all_results.extend(collection_results)
-
-                except Exception as e:
-                    print(f"Ошибка при работе с коллекцией {collection_name}: {str(e)}")
-                    collection_stats[collection_name] = {"error": str(e)}
-
-            # Сортируем все результаты по score (по убыванию)
-            all_results_sorted = sorted(all_results, key=lambda x: x["score"], reverse=True)
-
             # Берем топ-5 результатов из всех коллекций
-            top_results = all_results_sorted[:5]
+            top_results, collection_stats = search_collections(
+                COLLECTIONS, partial(bm25_search, pool, input_data["query"])
+            )
+
+            return RAGOutput(search_results=top_results, top_k=len(top_results), collection_stats=collection_stats)
+
+        async def ainvoke(self, input_data: RAGInput) -> RAGOutput:
+            top_results, collection_stats = await asearch_collections(
+                COLLECTIONS, partial(bm25_search, pool, input_data["query"])
+            )
 
             return RAGOutput(search_results=top_results, top_k=len(top_results), collection_stats=collection_stats)
 
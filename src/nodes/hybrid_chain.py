@@ -0,0 +1,113 @@
+import asyncio
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import Runnable
+
+from config import (
+    COLLECTIONS,
+    E5_COLLECTIONS,
+    HYBRID_MIN_SCORE,
+    HYBRID_RRF_K,
+    HYBRID_TOP_K,
+    HYBRID_WEIGHTS,
+    MILVUS_HOST,
+    MILVUS_PORT,
+)
+from nodes.embeddings import QueryEmbeddings, createQueryEmbeddings
+from nodes.faq_chain import bm25_search
+from nodes.milvus_pool import MilvusCollectionPool, get_retrieval_pool
+from nodes.milvus_search import asearch_collections, search_collections
+from nodes.rag_chain import RAGInput, RAGOutput, e5_search
+
+# Сколько результатов возвращает одна коллекция (limit в bm25_search и e5_search)
+COLLECTION_LIMIT = 5
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[List[dict]], weights: Dict[str, float], k: int) -> List[dict]:
+    """
+    Объединяет ранжированные списки (выдачи разных видов поиска) в один.
+
+    Score документа — сумма weight / (k + rank) по спискам, в которых он встретился, где weight —
+    вес вида поиска (поле retriever). Так BM25 и косинусные оценки, несравнимые между собой,
+    сводятся к одной шкале; исходная оценка сохраняется в raw_score.
+    """
+    fused: Dict[tuple, dict] = {}
+    for results in ranked_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = (doc["collection"], doc.get("id", doc["content"]))
+            entry = fused.setdefault(key, {**doc, "raw_score": doc["score"], "score": 0.0})
+            entry["score"] += weights.get(doc["retriever"], 1.0) / (k + rank)
+    return sorted(fused.values(), key=lambda doc: doc["score"], reverse=True)
+
+
+def _tagged(results: List[dict], retriever: str) -> List[dict]:
+    return [{**doc, "retriever": retriever} for doc in results]
+
+
+def createHybridChain(
+    host: str = MILVUS_HOST,
+    port: int = MILVUS_PORT,
+    embeddings: Optional[QueryEmbeddings] = None,
+    pool: Optional[MilvusCollectionPool] = None,
+    top_k: int = HYBRID_TOP_K,
+    min_score: float = HYBRID_MIN_SCORE,
+) -> Runnable[RAGInput, RAGOutput]:
+    """
+    Создаёт цепочку гибридного поиска: BM25 по коллекциям FAQ и E5 по коллекциям документов
+    в одном вызове с объединением выдачи через reciprocal rank fusion.
+
+    BM25 не зависит от эмбеддинга, поэтому разреженный поиск стартует сразу, параллельно
+    с расчётом эмбеддинга запроса. Результаты помечаются полем retriever ("bm25" или "e5").
+    """
+    if embeddings is None:
+        embeddings = createQueryEmbeddings()
+    pool = pool or get_retrieval_pool(host, port)
+
+    def fuse(sparse: Tuple[List[dict], dict], dense: Tuple[List[dict], dict]) -> RAGOutput:
+        # Внутри одного вида поиска коллекции уже объединены по исходной оценке (merge_top_k)
+        ranked_lists = [_tagged(sparse[0], "bm25"), _tagged(dense[0], "e5")]
+        fused = reciprocal_rank_fusion(ranked_lists, HYBRID_WEIGHTS, HYBRID_RRF_K)
+        top_results = [doc for doc in fused if doc["score"] >= min_score][:top_k]
+        return RAGOutput(
+            search_results=top_results,
+            top_k=len(top_results),
+            collection_stats={**sparse[1], **dense[1]},
+        )
+
+    class HybridRunnable(Runnable[RAGInput, RAGOutput]):
+        def invoke(self, input_data: RAGInput) -> RAGOutput:
+            query_embedding = embeddings.embed_query(input_data["query"])
+            sparse = search_collections(
+                COLLECTIONS,
+                partial(bm25_search, pool, input_data["query"]),
+                top_k=len(COLLECTIONS) * COLLECTION_LIMIT,
+            )
+            dense = search_collections(
+                E5_COLLECTIONS,
+                partial(e5_search, pool, query_embedding),
+                top_k=len(E5_COLLECTIONS) * COLLECTION_LIMIT,
+            )
+            return fuse(sparse, dense)
+
+        async def ainvoke(self, input_data: RAGInput) -> RAGOutput:
+            sparse_task = asyncio.ensure_future(
+                asearch_collections(
+                    COLLECTIONS,
+                    partial(bm25_search, pool, input_data["query"]),
+                    top_k=len(COLLECTIONS) * COLLECTION_LIMIT,
+                )
+            )
+            try:
+                query_embedding = await embeddings.aembed_query(input_data["query"])
+                dense = await asearch_collections(
+                    E5_COLLECTIONS,
+                    partial(e5_search, pool, query_embedding),
+                    top_k=len(E5_COLLECTIONS) * COLLECTION_LIMIT,
+                )
+            except BaseException:
+                sparse_task.cancel()
+                raise
+            return fuse(await sparse_task, dense)
+
+    return HybridRunnable()
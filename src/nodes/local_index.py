@@ -0,0 +1,329 @@
+"""
+Локальный снимок коллекций Milvus и поиск по нему в памяти процесса.
+
+Формат снимка (LOCAL_INDEX_PATH — символическая ссылка на каталог текущей версии, см. scripts/export_local_index.py):
+    manifest.json              — коллекции, число записей, поля, параметры BM25
+    <collection>/rows.json     — скалярные поля записей (включая первичный ключ) в порядке индексов
+    <collection>/<field>.f32   — плотные векторы float32 [count, dim] (для COSINE — нормированные)
+    <collection>/<field>.*.npy — BM25: словарь, idf и постинги в формате CSR по термам
+
+Векторы и постинги открываются через memory map, поэтому снимок не копируется в память каждого
+процесса. Поиск по векторам — точный (матричное умножение NumPy), BM25 считается по постингам
+терминов запроса.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import LOCAL_BM25_B, LOCAL_BM25_K1, LOCAL_INDEX_PATH, MILVUS_HEALTH_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+ROWS_FILE = "rows.json"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Токенизация, близкая к стандартному анализатору Milvus: слова Unicode в нижнем регистре."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    if limit >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, limit)[:limit]
+    return top[np.argsort(-scores[top])]
+
+
+class LocalDenseIndex:
+    """Точный поиск по плотным векторам: скалярное произведение (для COSINE векторы нормированы)."""
+
+    def __init__(self, vectors: np.ndarray, metric: str) -> None:
+        self.vectors = vectors
+        self.metric = metric
+
+    @staticmethod
+    def prepare(vectors: np.ndarray, metric: str) -> np.ndarray:
+        if metric == "COSINE":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.where(norms == 0, 1, norms)
+        if metric == "IP":
+            return vectors
+        raise ValueError(f"Metric {metric} is not supported by the local index")
+
+    def save(self, directory: str, field: str) -> None:
+        memmap = np.memmap(
+            os.path.join(directory, f"{field}.f32"), dtype=np.float32, mode="w+", shape=self.vectors.shape
+        )
+        memmap[:] = self.vectors
+        memmap.flush()
+
+    @classmethod
+    def load(cls, directory: str, field: str, count: int, dim: int, metric: str) -> "LocalDenseIndex":
+        path = os.path.join(directory, f"{field}.f32")
+        return cls(np.memmap(path, dtype=np.float32, mode="r", shape=(count, dim)), metric)
+
+    def search(self, query: Sequence[float], limit: int) -> List[tuple]:
+        query = np.asarray(query, dtype=np.float32)
+        if self.metric == "COSINE":
+            query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.vectors @ query
+        return [(int(i), float(scores[i])) for i in _top_k(scores, limit)]
+
+
+class LocalBM25Index:
+    """
+    BM25 по постингам: для каждого терма — документы и вклад tf-нормировки, посчитанный при экспорте.
+    Score документа — сумма idf * вклад по термам запроса (с учётом их повторов).
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        idf: np.ndarray,
+        indptr: np.ndarray,
+        documents: np.ndarray,
+        weights: np.ndarray,
+        count: int,
+    ) -> None:
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.documents = documents
+        self.weights = weights
+        self.count = count
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = LOCAL_BM25_K1, b: float = LOCAL_BM25_B) -> "LocalBM25Index":
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[tuple]] = {}
+        for doc, counts in enumerate(term_counts):
+            norm = k1 * (1 - b + b * lengths[doc] / average_length)
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf * (k1 + 1) / (tf + norm)))
+
+        vocabulary = {term: i for i, term in enumerate(sorted(postings))}
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        documents, weights = [], []
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        for term, i in vocabulary.items():
+            entries = postings[term]
+            indptr[i + 1] = indptr[i] + len(entries)
+            documents.extend(doc for doc, _ in entries)
+            weights.extend(weight for _, weight in entries)
+            idf[i] = np.log(1 + (len(texts) - len(entries) + 0.5) / (len(entries) + 0.5))
+
+        return cls(
+            vocabulary,
+            idf,
+            indptr,
+            np.array(documents, dtype=np.int32),
+            np.array(weights, dtype=np.float32),
+            len(texts),
+        )
+
+    def save(self, directory: str, field: str) -> None:
+        with open(os.path.join(directory, f"{field}.vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+        for name in ("idf", "indptr", "documents", "weights"):
+            np.save(os.path.join(directory, f"{field}.{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, field: str, count: int) -> "LocalBM25Index":
+        with open(os.path.join(directory, f"{field}.vocab.json"), encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{field}.{name}.npy"), mmap_mode="r")
+            for name in ("idf", "indptr", "documents", "weights")
+        }
+        return cls(vocabulary, count=count, **arrays)
+
+    def search(self, query: str, limit: int) -> List[tuple]:
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term, repeats in Counter(tokenize(query)).items():
+            i = self.vocabulary.get(term)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            # В постингах терма каждый документ встречается один раз, поэтому сложение без np.add.at
+            scores[self.documents[start:end]] += repeats * self.idf[i] * self.weights[start:end]
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return []
+        order = _top_k(scores[matched], limit)
+        return [(int(matched[i]), float(scores[matched[i]])) for i in order]
+
+
+class LocalCollection:
+    """Коллекция снимка: записи и индексы по полям, по которым в Milvus идёт поиск (anns_field)."""
+
+    def __init__(self, name: str, rows: List[dict], primary_key: str, indexes: Dict[str, object]) -> None:
+        self.name = name
+        self.rows = rows
+        self.primary_key = primary_key
+        self.indexes = indexes
+
+    @classmethod
+    def load(cls, root: str, name: str, meta: dict) -> "LocalCollection":
+        directory = os.path.join(root, name)
+        with open(os.path.join(directory, ROWS_FILE), encoding="utf-8") as f:
+            rows = json.load(f)
+        indexes: Dict[str, object] = {}
+        for field, dense in meta.get("dense", {}).items():
+            indexes[field] = LocalDenseIndex.load(directory, field, meta["count"], dense["dim"], dense["metric"])
+        for field in meta.get("bm25", {}):
+            indexes[field] = LocalBM25Index.load(directory, field, meta["count"])
+        return cls(name, rows, meta["primary_key"], indexes)
+
+    def search(self, data: list, anns_field: str, limit: int = 5, output_fields: Sequence[str] = (), **kwargs):
+        """Поиск с интерфейсом Collection.search: возвращает список хитов (id, score, fields) на каждый запрос."""
+        index = self.indexes.get(anns_field)
+        if index is None:
+            raise ValueError(f"Collection {self.name} has no local index for field {anns_field}")
+        return [
+            [
+                SimpleNamespace(
+                    id=self.rows[doc][self.primary_key],
+                    score=score,
+                    fields={field: self.rows[doc].get(field) for field in output_fields},
+                )
+                for doc, score in index.search(query, limit)
+            ]
+            for query in data
+        ]
+
+
+class LocalIndexPool:
+    """
+    Замена MilvusCollectionPool для поиска по локальному снимку (RETRIEVAL_BACKEND="local"):
+    те же search/get/preload/on_reload, без сетевых запросов.
+
+    Фоновая проверка следит за manifest.json: после повторного экспорта снимок перечитывается,
+    и вызываются обработчики перезагрузки (как при переиндексации коллекции в Milvus).
+    """
+
+    def __init__(
+        self, path: str = LOCAL_INDEX_PATH, health_check_interval: float = MILVUS_HEALTH_CHECK_INTERVAL
+    ) -> None:
+        self.path = path
+        self.health_check_interval = health_check_interval
+        self._lock = threading.RLock()
+        self._manifest: Optional[dict] = None
+        self._manifest_mtime = 0.0
+        # Каталог версии снимка, из которого прочитан манифест: коллекции загружаются из него же,
+        # даже если ссылка self.path уже переключена на новую версию
+        self._snapshot_path = path
+        self._collections: Dict[str, LocalCollection] = {}
+        self._reload_callbacks: List[Callable[[str], None]] = []
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    snapshot_path = os.path.realpath(self.path)
+                    manifest_path = os.path.join(snapshot_path, MANIFEST_FILE)
+                    with open(manifest_path, encoding="utf-8") as f:
+                        manifest = json.load(f)
+                    self._snapshot_path = snapshot_path
+                    self._manifest_mtime = os.path.getmtime(manifest_path)
+                    self._manifest = manifest
+                    logger.info(f"Local index snapshot loaded: {snapshot_path} ({manifest.get('created_at')})")
+        return self._manifest
+
+    def on_reload(self, callback: Callable[[str], None]) -> None:
+        self._reload_callbacks.append(callback)
+
+    def get(self, collection_name: str) -> LocalCollection:
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                meta = self.manifest["collections"].get(collection_name)
+                if meta is None:
+                    raise KeyError(f"Collection {collection_name} is not in the local snapshot {self.path}")
+                collection = LocalCollection.load(self._snapshot_path, collection_name, meta)
+                self._collections[collection_name] = collection
+            return collection
+
+    def preload(self, collection_names: Sequence[str]) -> None:
+        for collection_name in collection_names:
+            try:
+                self.get(collection_name)
+            except Exception as e:
+                logger.error(f"Local index preload failed for {collection_name}: {e}")
+        self.start_health_checks()
+
+    def search(self, collection_name: str, **search_kwargs):
+        return self.get(collection_name).search(**search_kwargs)
+
+    def health_check(self) -> None:
+        try:
+            snapshot_path = os.path.realpath(self.path)
+            mtime = os.path.getmtime(os.path.join(snapshot_path, MANIFEST_FILE))
+        except OSError as e:
+            logger.error(f"Local index snapshot is not available: {e}")
+            return
+        if self._manifest is None or (snapshot_path == self._snapshot_path and mtime == self._manifest_mtime):
+            return
+
+        with self._lock:
+            reloaded = list(self._collections)
+            self._manifest = None
+            self._collections.clear()
+        logger.info(f"Local index snapshot changed, reloading: {self.path}")
+        for collection_name in reloaded:
+            for callback in self._reload_callbacks:
+                # Ошибка одного обработчика не должна пропускать остальные
+                try:
+                    callback(collection_name)
+                except Exception:
+                    logger.exception(f"Local index reload callback failed for {collection_name}")
+
+    def start_health_checks(self) -> None:
+        with self._lock:
+            if self._health_thread is not None or self.health_check_interval <= 0:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="local-index-watch", daemon=True)
+            self._health_thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_check_interval):
+            try:
+                self.health_check()
+            except Exception:
+                # Поток проверки не должен завершаться: иначе новые снимки больше не подхватываются
+                logger.exception("Local index health check failed")
+
+
+_pools: Dict[str, LocalIndexPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_local_index_pool(path: str = LOCAL_INDEX_PATH) -> LocalIndexPool:
+    """Возвращает общий для процесса пул локального снимка."""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = LocalIndexPool(path)
+        return pool
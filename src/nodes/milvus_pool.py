@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymilvus import Collection, MilvusException, connections, utility
+from pymilvus.client.types import LoadState
+
+from config import (
+    MILVUS_ALIAS,
+    MILVUS_HEALTH_CHECK_INTERVAL,
+    MILVUS_HOST,
+    MILVUS_PORT,
+    MILVUS_SEARCH_TIMEOUT,
+    RETRIEVAL_BACKEND,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MilvusCollectionPool:
+    """
+    Долгоживущее подключение к Milvus и кэш загруженных коллекций.
+
+    Подключение и загрузка коллекций выполняются один раз, а не на каждый запрос.
+    Фоновая проверка здоровья переподключается при недоступности сервера и перезагружает
+    коллекцию только если изменилась её схема или она была пересоздана (переиндексация).
+    """
+
+    def __init__(
+        self,
+        host: str = MILVUS_HOST,
+        port: int = MILVUS_PORT,
+        alias: str = MILVUS_ALIAS,
+        health_check_interval: float = MILVUS_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.alias = alias
+        self.health_check_interval = health_check_interval
+        self._lock = threading.RLock()
+        self._collections: Dict[str, Collection] = {}
+        # Отпечатки отслеживаемых коллекций; в отличие от _collections переживают переподключение,
+        # поэтому проверка здоровья продолжает следить за коллекциями и замечает их пересоздание во время сбоя
+        self._fingerprints: Dict[str, Tuple] = {}
+        self._reload_callbacks: List[Callable[[str], None]] = []
+        # Номер подключения: растёт при каждом переподключении, чтобы одновременные ошибки поиска
+        # переподключались один раз, а не по разу на каждый запрос
+        self._generation = 0
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def connect(self) -> None:
+        with self._lock:
+            if not connections.has_connection(self.alias):
+                connections.connect(self.alias, host=self.host, port=self.port)
+                logger.info(f"Milvus connected: {self.alias} -> {self.host}:{self.port}")
+
+    def reconnect(self, generation: Optional[int] = None) -> None:
+        """
+        Пересоздаёт подключение; кэшированные коллекции будут загружены заново при следующем обращении.
+        Если передан generation и с тех пор подключение уже пересоздано, повторно не переподключается.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._generation += 1
+            try:
+                connections.disconnect(self.alias)
+            except Exception as e:
+                logger.warning(f"Milvus disconnect failed: {e}")
+            self._collections.clear()
+            self.connect()
+
+    def is_healthy(self) -> bool:
+        try:
+            utility.get_server_version(using=self.alias, timeout=MILVUS_SEARCH_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning(f"Milvus health check failed: {e}")
+            return False
+
+    def on_reload(self, callback: Callable[[str], None]) -> None:
+        """Регистрирует обработчик, вызываемый с именем коллекции после её перезагрузки."""
+        self._reload_callbacks.append(callback)
+
+    def get(self, collection_name: str) -> Collection:
+        """Возвращает загруженную коллекцию из кэша, при необходимости подключаясь и загружая её."""
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                self.connect()
+                collection = Collection(collection_name, using=self.alias)
+                collection.load()
+                self._remember(collection_name, collection, self._fingerprint(collection))
+            return collection
+
+    def _remember(
+        self, collection_name: str, collection: Collection, fingerprint: Tuple, reloaded: bool = False
+    ) -> None:
+        """
+        Сохраняет загруженную коллекцию. Обработчики перезагрузки вызываются, если коллекция была
+        перезагружена проверкой здоровья (reloaded) или изменилась с прошлой загрузки.
+        """
+        with self._lock:
+            previous = self._fingerprints.get(collection_name)
+            self._collections[collection_name] = collection
+            self._fingerprints[collection_name] = fingerprint
+        if reloaded or (previous is not None and previous != fingerprint):
+            logger.info(f"Milvus collection reloaded: {collection_name}")
+            for callback in self._reload_callbacks:
+                # Ошибка обработчика не должна прерывать поиск (get вызывается из запроса) и остальные обработчики
+                try:
+                    callback(collection_name)
+                except Exception:
+                    logger.exception(f"Milvus reload callback failed for {collection_name}")
+
+    def preload(self, collection_names: Sequence[str]) -> None:
+        """Загружает коллекции заранее (при старте); ошибки не фатальны — коллекция загрузится при первом запросе."""
+        for collection_name in collection_names:
+            try:
+                self.get(collection_name)
+            except Exception as e:
+                logger.error(f"Milvus preload failed for {collection_name}: {e}")
+        self.start_health_checks()
+
+    def search(self, collection_name: str, **search_kwargs):
+        """Поиск по коллекции с одной повторной попыткой после переподключения (в пределах того же timeout)."""
+        start = time.monotonic()
+        generation = self._generation
+        try:
+            return self.get(collection_name).search(**search_kwargs)
+        except MilvusException as e:
+            logger.warning(f"Milvus search failed for {collection_name}, reconnecting: {e}")
+            # Если подключение уже пересоздал другой поиск, только повторяем запрос
+            self.reconnect(generation)
+            timeout = search_kwargs.get("timeout")
+            if timeout is not None:
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise
+                search_kwargs["timeout"] = remaining
+            return self.get(collection_name).search(**search_kwargs)
+
+    def health_check(self) -> None:
+        if not self.is_healthy():
+            self.reconnect()
+            return
+
+        for collection_name in list(self._fingerprints):
+            try:
+                collection = Collection(collection_name, using=self.alias)
+                fingerprint = self._fingerprint(collection)
+                state = utility.load_state(collection_name, using=self.alias, timeout=MILVUS_SEARCH_TIMEOUT)
+                if fingerprint == self._fingerprints.get(collection_name) and state == LoadState.Loaded:
+                    continue
+
+                collection.load()
+                self._remember(collection_name, collection, fingerprint, reloaded=True)
+            except Exception as e:
+                logger.error(f"Milvus health check failed for {collection_name}: {e}")
+
+    def start_health_checks(self) -> None:
+        with self._lock:
+            if self._health_thread is not None or self.health_check_interval <= 0:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="milvus-health", daemon=True)
+            self._health_thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        connections.disconnect(self.alias)
+
+    def _health_loop(self) -> None:
+        # Поток живёт всё время работы процесса: сбой одной проверки (например, Milvus недоступен
+        # и переподключение не удалось) не должен останавливать следующие
+        while not self._stop.wait(self.health_check_interval):
+            try:
+                self.health_check()
+            except Exception:
+                logger.exception("Milvus health check failed")
+
+    @staticmethod
+    def _fingerprint(collection: Collection) -> Tuple:
+        # collection_id меняется при пересоздании коллекции, fields — при изменении схемы
+        description = collection.describe(timeout=MILVUS_SEARCH_TIMEOUT)
+        return (
+            description.get("collection_id"),
+            description.get("created_timestamp"),
+            repr(description.get("fields")),
+        )
+
+
+_pools: Dict[Tuple[str, int], MilvusCollectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_milvus_pool(host: str = MILVUS_HOST, port: int = MILVUS_PORT) -> MilvusCollectionPool:
+    """Возвращает общий для процесса пул для указанного сервера Milvus."""
+    with _pools_lock:
+        pool = _pools.get((host, port))
+        if pool is None:
+            alias = MILVUS_ALIAS if (host, port) == (MILVUS_HOST, MILVUS_PORT) else f"{MILVUS_ALIAS}-{host}:{port}"
+            pool = MilvusCollectionPool(host=host, port=port, alias=alias)
+            _pools[(host, port)] = pool
+        return pool
+
+
+def get_retrieval_pool(host: str = MILVUS_HOST, port: int = MILVUS_PORT) -> MilvusCollectionPool:
+    """
+    Возвращает пул коллекций выбранного бэкенда поиска (RETRIEVAL_BACKEND): сервер Milvus
+    или локальный снимок (nodes/local_index.py) с тем же интерфейсом.
+    """
+    if RETRIEVAL_BACKEND == "local":
+        from nodes.local_index import get_local_index_pool
+
+        return get_local_index_pool()
+    return get_milvus_pool(host, port)
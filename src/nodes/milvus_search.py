@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import MILVUS_SEARCH_MAX_WORKERS, MILVUS_SEARCH_TIMEOUT
+from monitoring.instruments import MILVUS_SEARCH_ERRORS, MILVUS_SEARCH_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Функция поиска по одной коллекции: (имя коллекции, таймаут запроса к Milvus) -> отформатированные результаты.
+# Таймаут передаётся в Collection.search, чтобы зависший запрос освобождал поток пула, а не только ожидающего
+CollectionSearch = Callable[[str, float], List[dict]]
+
+# Общий ограниченный пул потоков для запросов к Milvus (pymilvus ORM синхронный)
+_executor = ThreadPoolExecutor(max_workers=MILVUS_SEARCH_MAX_WORKERS, thread_name_prefix="milvus-search")
+
+
+def _timed_search(
+    search: CollectionSearch, collection_name: str, timeout: float
+) -> Tuple[List[dict], float, Optional[Exception]]:
+    start = time.perf_counter()
+    try:
+        results, error = search(collection_name, timeout), None
+    except Exception as e:
+        results, error = [], e
+    latency = time.perf_counter() - start
+    MILVUS_SEARCH_LATENCY.observe(latency, collection=collection_name)
+    return results, latency * 1000, error
+
+
+def _collect(
+    outcomes: Dict[str, Tuple[List[dict], float, Optional[Exception]]],
+    timed_out: Sequence[str],
+    timeout: float,
+    top_k: int,
+) -> Tuple[List[dict], dict]:
+    all_results = []
+    collection_stats = {}
+
+    for collection_name in timed_out:
+        logger.warning(f"Коллекция {collection_name} не ответила за {timeout} с и исключена из выдачи")
+        collection_stats[collection_name] = {"error": f"timeout after {timeout}s", "latency_ms": timeout * 1000}
+        MILVUS_SEARCH_ERRORS.inc(collection=collection_name, reason="timeout")
+
+    for collection_name, (results, latency_ms, error) in outcomes.items():
+        if error is not None:
+            logger.error(f"Ошибка при работе с коллекцией {collection_name}: {error}")
+            collection_stats[collection_name] = {"error": str(error), "latency_ms": round(latency_ms, 1)}
+            MILVUS_SEARCH_ERRORS.inc(collection=collection_name, reason="error")
+            continue
+
+        collection_stats[collection_name] = {
+            "count": len(results),
+            "max_score": max([r["score"] for r in results]) if results else 0,
+            "latency_ms": round(latency_ms, 1),
+        }
+        all_results.extend(results)
+
+    return merge_top_k(all_results, top_k), collection_stats
+
+
+def merge_top_k(results: List[dict], top_k: int) -> List[dict]:
+    """
+    Возвращает top_k результатов с наибольшим score (по убыванию) без полной сортировки.
+    """
+    return heapq.nlargest(top_k, results, key=lambda x: x["score"])
+
+
+def search_collections(
+    collection_names: Sequence[str],
+    search: CollectionSearch,
+    top_k: int = 5,
+    timeout: float = MILVUS_SEARCH_TIMEOUT,
+) -> Tuple[List[dict], dict]:
+    """
+    Параллельно выполняет поиск по всем коллекциям и объединяет top_k результатов.
+
+    Коллекции, не ответившие за timeout секунд или завершившиеся ошибкой, исключаются из выдачи
+    и отражаются в статистике, не прерывая запрос.
+
+    Returns:
+        Tuple[List[dict], dict]: Объединённые результаты и статистика по коллекциям.
+    """
+    futures = {name: _executor.submit(_timed_search, search, name, timeout) for name in collection_names}
+    wait(futures.values(), timeout=timeout)
+
+    outcomes = {name: future.result() for name, future in futures.items() if future.done()}
+    timed_out = [name for name, future in futures.items() if not future.done()]
+    for name in timed_out:
+        futures[name].cancel()
+
+    return _collect(outcomes, timed_out, timeout, top_k)
+
+
+async def asearch_collections(
+    collection_names: Sequence[str],
+    search: CollectionSearch,
+    top_k: int = 5,
+    timeout: float = MILVUS_SEARCH_TIMEOUT,
+) -> Tuple[List[dict], dict]:
+    """
+    Асинхронный вариант search_collections: ожидание результатов не блокирует event loop.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = [
+        asyncio.wait_for(loop.run_in_executor(_executor, _timed_search, search, name, timeout), timeout)
+        for name in collection_names
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    outcomes = {}
+    timed_out = []
+    for name, result in zip(collection_names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            timed_out.append(name)
+        elif isinstance(result, BaseException):
+            outcomes[name] = ([], timeout * 1000, result)
+        else:
+            outcomes[name] = result
+
+    return _collect(outcomes, timed_out, timeout, top_k)
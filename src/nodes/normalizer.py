@@ -0,0 +1,206 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+
+from spellchecker import SpellChecker
+
+from config import (
+    ANSWER_NODE_SYSTEM_PROMPT,
+    PARAPHRASE_CORRECTION_MIN_FREQUENCY,
+    PARAPHRASE_CORRECTION_MIN_LENGTH,
+    PARAPHRASE_MAX_CORRECTIONS,
+    QUERY_ABBREVIATIONS,
+    QUERY_DOMAIN_VOCABULARY,
+    QUERY_TERM_ALIASES,
+)
+
+# Словарь pyspellchecker почти не содержит словоформ: слово с известной основой и окончанием
+# из INFLECTION_ENDINGS не считается опечаткой
+STEM_MIN_LENGTH = 5
+# Окончания и формообразующие суффиксы существительных, прилагательных и глаголов
+INFLECTION_ENDINGS = frozenset(
+    """
+    а я о е ё ы и у ю ь й л
+    ам ям ах ях ов ев ей ой ом ем ём ий ый ая яя ое ее ые ие ую юю ым им ых их ть ет ит ут ют ат ят ла ло ли ся сь
+    ами ями ого его ому ему ыми ими ешь ишь ете ите тся лся
+    ться лась лось лись
+    """.split()
+)
+INFLECTION_MAX_LENGTH = max(map(len, INFLECTION_ENDINGS))
+WORD_PATTERN = re.compile(r"\d+-[а-яёa-z]+|[а-яёa-z]+(?:-[а-яёa-z]+)*|\d+", re.IGNORECASE)
+# Данные, которые LLM-перефраз обезличивает: номера закупок/ИНН, телефоны, почта
+PERSONAL_DATA_PATTERN = re.compile(r"№|\d{3,}|@|\+7|\b8\s?\(?\d{3}", re.IGNORECASE)
+
+
+@dataclass
+class NormalizationResult:
+    text: str
+    confident: bool
+    corrections: int
+    unknown: int
+
+
+def glossary_terms(glossary: str = ANSWER_NODE_SYSTEM_PROMPT) -> Dict[str, str]:
+    """
+    Извлекает аббревиатуры из глоссария («термин<TAB>определение») в виде {нижний регистр: каноническая форма}.
+    Обычные слова глоссария (Виджет, Товар) не учитываются, чтобы не менять их регистр.
+    """
+    terms = {}
+    for line in glossary.splitlines():
+        if "\t" not in line:
+            continue
+        for term in line.split("\t", 1)[0].split(","):
+            term = term.strip().strip("«»'\"")
+            if term and (any(char.isupper() for char in term[1:]) or any(char.isdigit() for char in term)):
+                terms[term.lower()] = term
+    return terms
+
+
+class QueryNormalizer:
+    """
+    Быстрая локальная нормализация запроса без обращения к LLM:
+    - приводит термины глоссария и их варианты написания к канонической форме (44 фз -> 44-ФЗ)
+    - исправляет опечатки по словарю pyspellchecker, дополненному словарём предметной области
+    - раскрывает аббревиатуры (НМЦК -> НМЦК (начальная (максимальная) цена контракта))
+
+    Результат считается надёжным, если все слова известны, исправлений не больше допустимого
+    и каждое исправление ведёт к слову предметной области или к частому слову (редкие исправления
+    вроде «тендер» -> «бендер» часто портят термины), а в запросе нет персональных данных. Иначе нужен перефраз через LLM.
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, str],
+        aliases: Dict[str, str],
+        abbreviations: Dict[str, str],
+        vocabulary: Iterable[str] = (),
+        max_corrections: int = PARAPHRASE_MAX_CORRECTIONS,
+        correction_min_frequency: int = PARAPHRASE_CORRECTION_MIN_FREQUENCY,
+        correction_min_length: int = PARAPHRASE_CORRECTION_MIN_LENGTH,
+    ) -> None:
+        # Канонические формы терминов и аббревиатуры тоже термины: иначе проверка орфографии
+        # «исправляет» уже подставленную форму (ЭП -> Эй)
+        canonical = {form.lower(): form for form in [*aliases.values(), *abbreviations] if WORD_PATTERN.fullmatch(form)}
+        self.terms = {**canonical, **terms, **{alias.lower(): form for alias, form in aliases.items()}}
+        self.abbreviations = abbreviations
+        self.max_corrections = max_corrections
+        self.correction_min_frequency = correction_min_frequency
+        self.correction_min_length = correction_min_length
+        alternatives = "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True))
+        self._alias_pattern = re.compile(r"(?<![\w-])(" + alternatives + r")(?![\w-])", re.IGNORECASE)
+        self._aliases = {alias.lower(): canonical for alias, canonical in aliases.items()}
+        self._lock = threading.Lock()
+        self._spellchecker = SpellChecker(language="ru", distance=1, case_sensitive=False)
+        self._known: Set[str] = set()
+        self._stems: Set[str] = set()
+        self._add_stems(self._spellchecker.word_frequency.keys())
+        # Многословные канонические формы и расшифровки аббревиатур («Портал поставщиков») — словарные слова
+        self.learn([*vocabulary, *aliases.values(), *abbreviations.values()])
+
+    def _add_stems(self, words: Iterable[str]) -> None:
+        for word in words:
+            self._stems.update(self._stem_candidates(word))
+
+    @staticmethod
+    def _stem_candidates(word: str) -> List[str]:
+        """
+        Возможные основы слова: без каждого из подходящих окончаний INFLECTION_ENDINGS,
+        а если ни одно не подходит (нулевое окончание, «тендер») — само слово.
+        """
+        endings = [length for length in range(1, INFLECTION_MAX_LENGTH + 1) if word[-length:] in INFLECTION_ENDINGS]
+        if not endings:
+            return [word]
+        return [word[:-length] for length in endings if len(word) - length >= STEM_MIN_LENGTH]
+
+    def learn(self, text: Iterable[str]) -> None:
+        """Добавляет слова в словарь предметной области (глоссарий, термины, слова закупочной тематики)."""
+        chunks = [text] if isinstance(text, str) else text
+        words = [word.lower() for chunk in chunks for word in WORD_PATTERN.findall(chunk)]
+        with self._lock:
+            new_words = [word for word in words if word not in self._known]
+            if new_words:
+                self._known.update(new_words)
+                self._add_stems(new_words)
+                self._spellchecker.word_frequency.load_words(new_words)
+
+    def normalize(self, query: str) -> NormalizationResult:
+        text = " ".join(query.split())
+        text = self._alias_pattern.sub(lambda match: self._aliases[match.group(0).lower()], text)
+
+        corrections, unknown, rare_corrections = 0, 0, 0
+        parts = []
+        position = 0
+        for match in WORD_PATTERN.finditer(text):
+            word = match.group(0)
+            parts.append(text[position : match.start()])
+            position = match.end()
+
+            lower = word.lower()
+            if lower in self.terms:
+                parts.append(self.terms[lower])
+            elif lower.isdigit() or self._is_known(lower):
+                parts.append(word)
+            else:
+                correction = self._correct(lower)
+                if correction is None:
+                    unknown += 1
+                    parts.append(word)
+                else:
+                    corrections += 1
+                    if not self._is_reliable_correction(correction):
+                        rare_corrections += 1
+                    parts.append(correction.capitalize() if word[0].isupper() else correction)
+        parts.append(text[position:])
+        normalized = "".join(parts).strip()
+
+        for abbreviation, expansion in self.abbreviations.items():
+            normalized = re.sub(
+                rf"(?<![\w-]){re.escape(abbreviation)}(?![\w-])(?!\s*\()",
+                f"{abbreviation} ({expansion})",
+                normalized,
+                count=1,
+            )
+
+        if normalized:
+            normalized = normalized[0].upper() + normalized[1:]
+
+        confident = (
+            bool(normalized)
+            and unknown == 0
+            and corrections <= self.max_corrections
+            and rare_corrections == 0
+            and PERSONAL_DATA_PATTERN.search(query) is None
+        )
+        return NormalizationResult(text=normalized, confident=confident, corrections=corrections, unknown=unknown)
+
+    def _is_known(self, word: str) -> bool:
+        if word in self._known or word in self._spellchecker:
+            return True
+        return any(stem in self._stems for stem in self._stem_candidates(word))
+
+    def _is_reliable_correction(self, correction: str) -> bool:
+        # Слова предметной области (глоссарий, QUERY_DOMAIN_VOCABULARY) заданы вручную и надёжны;
+        # у общих слов словаря учитывается частота
+        if len(correction) < self.correction_min_length:
+            return False
+        with self._lock:
+            known = correction in self._known
+        return known or self._spellchecker.word_frequency[correction] >= self.correction_min_frequency
+
+    def _correct(self, word: str):
+        with self._lock:
+            correction = self._spellchecker.correction(word)
+        return correction if correction and correction != word else None
+
+
+def createQueryNormalizer() -> QueryNormalizer:
+    """
+    Создаёт локальный нормализатор запросов со словарём из глоссария портала.
+    """
+    return QueryNormalizer(
+        terms=glossary_terms(),
+        aliases=QUERY_TERM_ALIASES,
+        abbreviations=QUERY_ABBREVIATIONS,
+        vocabulary=[ANSWER_NODE_SYSTEM_PROMPT, *QUERY_DOMAIN_VOCABULARY],
+    )
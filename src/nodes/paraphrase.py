@@ -1,12 +1,15 @@
-from typing import Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, Literal, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
 
-from config import CLIENT_URL, LLM_NAME
+from caching import LRUCache, normalize_query
+from config import CLIENT_URL, LLM_NAME, PARAPHRASE_CACHE_SIZE
+from monitoring import observe_llm
+from nodes.normalizer import QueryNormalizer
 
 
 class ParaphraseInput(TypedDict):
@@ -16,11 +19,13 @@ class ParaphraseInput(TypedDict):
 
 class ParaphraseOutput(BaseModel):
     paraphrased_query: str = Field(description="Перефразированный запрос")
+    source: Literal["llm", "local", "cache"] = Field(description="Кто выполнил перефраз", default="llm")
 
 
 def createParaphraseChain(
     llm_name: str = LLM_NAME,
     headers: Optional[Dict[str, str]] = None,
+    normalizer: Optional[QueryNormalizer] = None,
 ) -> Runnable[ParaphraseInput, ParaphraseOutput]:
     """
     Создаёт цепочку для умного перефраза запросов:
@@ -30,6 +35,9 @@ def createParaphraseChain(
     - Обезличивает личные данные
     - Сохраняет термины в оригинальном виде
     - Не изменяет корректные формальные запросы
+
+    Повторные запросы берутся из кэша перефразов. Если передан локальный нормализатор
+    и он уверен в результате, вызов LLM не выполняется.
     """
     prompt_template = PromptTemplate.from_template(
         """Перефразируйте запрос в сфере госзакупок, соблюдая правила:
@@ -54,30 +62,71 @@ def createParaphraseChain(
     )
 
     client = OpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    async_client = AsyncOpenAI(api_key="EMPTY", base_url=CLIENT_URL)
 
-    class ParaphraseRunnable(Runnable[ParaphraseInput, ParaphraseOutput]):
-        def invoke(self, input_data: ParaphraseInput) -> ParaphraseOutput:
-            original_query = input_data["query"].strip()
+    def build_request(input_data: ParaphraseInput) -> Dict[str, Any]:
+        original_query = input_data["query"].strip()
+
+        prompt = prompt_template.format(query=original_query)
+
+        return dict(
+            model=llm_name,
+            messages=[
+                {"role": "system", "content": "Вы помощник для перефраза запросов."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+            max_tokens=100,
+            stream=False,
+        )
 
-            prompt = prompt_template.format(query=original_query)
+    cache: LRUCache[str] = LRUCache(PARAPHRASE_CACHE_SIZE)
 
-            response = client.chat.completions.create(
-                model=llm_name,
-                messages=[
-                    {"role": "system", "content": "Вы помощник для перефраза запросов."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.1,
-                max_tokens=100,
-                stream=False,
-            )
+    def parse_response(response) -> str:
+        paraphrased_query = response.choices[0].message.content.strip()
 
-            paraphrased_query = response.choices[0].message.content.strip()
+        print("paraphrased_query")
+        print(paraphrased_query)
+        print("paraphrased_query")
 
-            print("paraphrased_query")
-            print(paraphrased_query)
-            print("paraphrased_query")
+        return paraphrased_query
 
-            return ParaphraseOutput(paraphrased_query=paraphrased_query)
+    def paraphrase_locally(input_data: ParaphraseInput) -> Optional[ParaphraseOutput]:
+        key = normalize_query(input_data["query"])
+        cached = cache.get(key)
+        if cached is not None:
+            return ParaphraseOutput(paraphrased_query=cached, source="cache")
+
+        if normalizer is not None:
+            result = normalizer.normalize(input_data["query"])
+            if result.confident:
+                cache.put(key, result.text)
+                return ParaphraseOutput(paraphrased_query=result.text, source="local")
+        return None
+
+    def remember(input_data: ParaphraseInput, paraphrased_query: str) -> ParaphraseOutput:
+        cache.put(normalize_query(input_data["query"]), paraphrased_query)
+        return ParaphraseOutput(paraphrased_query=paraphrased_query)
+
+    class ParaphraseRunnable(Runnable[ParaphraseInput, ParaphraseOutput]):
+        def invoke(self, input_data: ParaphraseInput) -> ParaphraseOutput:
+            local_result = paraphrase_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("paraphrase") as call:
+                response = client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return remember(input_data, parse_response(response))
+
+        async def ainvoke(self, input_data: ParaphraseInput) -> ParaphraseOutput:
+            local_result = paraphrase_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("paraphrase") as call:
+                response = await async_client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return remember(input_data, parse_response(response))
 
     return ParaphraseRunnable()
@@ -1,12 +1,14 @@
-from typing import List, TypedDict
+from functools import partial
+from typing import List, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import Runnable
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from pydantic import BaseModel, Field
-from pymilvus import Collection, connections
 
-from config import E5_COLLECTIONS, EMBEDDING_MODEL_NAME, MILVUS_HOST, MILVUS_PORT
+from config import E5_COLLECTIONS, EMBEDDING_DEVICE, LAZY_STARTUP, MILVUS_HOST, MILVUS_PORT, MILVUS_SEARCH_TIMEOUT
+from nodes.embeddings import QueryEmbeddings, createQueryEmbeddings
+from nodes.milvus_pool import MilvusCollectionPool, get_retrieval_pool
+from nodes.milvus_search import asearch_collections, search_collections
 
 
 class RAGInput(TypedDict):
@@ -21,69 +23,70 @@ class RAGOutput(BaseModel):
     # image_data: str = Field(description="Информация о картинках") # FIXME: fix part with images
 
 
+def e5_search(
+    pool: MilvusCollectionPool,
+    query_embedding: List[float],
+    collection_name: str,
+    timeout: float = MILVUS_SEARCH_TIMEOUT,
+) -> List[dict]:
+    """Поиск по эмбеддингу E5 (косинусная мера) в одной коллекции (используется и гибридным поиском)."""
+    # Выполняем поиск по эмбеддингу
+    results = pool.search(
+        collection_name,
+        data=[query_embedding],
+        anns_field="e5",
+        param={"metric_type": "COSINE", "params": {}},
+        limit=5,
+        output_fields=["document_name", "header", "text", "pictures"],
+        timeout=timeout,
+    )
+    # Форматируем результаты
+    collection_results = []
+    for hit in results[0]:
+        collection_results.append(
+            {
+                "collection": collection_name,
+                "id": hit.id,
+                "document_name": hit.fields.get("document_name", ""),
+                "header": hit.fields.get("header", ""),
+                "content": hit.fields.get("text", ""),
+                "pictures": hit.fields.get("pictures", ""),
+                "score": float(hit.score),
+            }
+        )
+    return collection_results
+
+
 def createRAGChain(
-    host: str = MILVUS_HOST, port: int = MILVUS_PORT, device: str = "cuda:0"
+    host: str = MILVUS_HOST,
+    port: int = MILVUS_PORT,
+    device: str = EMBEDDING_DEVICE,
+    embeddings: Optional[QueryEmbeddings] = None,
+    pool: Optional[MilvusCollectionPool] = None,
 ) -> Runnable[RAGInput, RAGOutput]:
     """
     Создаёт цепочку для поиска релевантных документов в Milvus с использованием E5 эмбеддингов.
+    Поиск по коллекциям выполняется параллельно.
     """
-    # Инициализация модели для эмбеддингов
-    model_name = EMBEDDING_MODEL_NAME
-    hf_embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": device})
+    # Инициализация модели для эмбеддингов (с кэшем эмбеддингов запросов)
+    if embeddings is None:
+        embeddings = createQueryEmbeddings(device=device)
+
+    # Подключение и коллекции загружаются один раз: при создании цепочки
+    # или, при ленивом старте, фоновым прогревом приложения (startup.py)
+    pool = pool or get_retrieval_pool(host, port)
+    if not LAZY_STARTUP:
+        pool.preload(E5_COLLECTIONS)
 
     class RAGRunnable(Runnable[RAGInput, RAGOutput]):
         def invoke(self, input_data: RAGInput) -> RAGOutput:
-            user_query = input_data["query"]
-
             # Создаем эмбеддинг для запроса
-            query_embedding = hf_embeddings.embed_query(user_query)
-
-            connections.connect("default", host=host, port=port)
-
-            all_results = []
-            collection_stats = {}
-
-            for collection_name in E5_COLLECTIONS:
-                try:
-                    collection = Collection(collection_name)
-                    collection.load()
-
-                    # Выполняем поиск по эмбеддингу
-                    results = collection.search(
-                        data=[query_embedding],
-                        anns_field="e5",
-                        param={"metric_type": "COSINE", "params": {}},
-                        limit=5,
-                        output_fields=["document_name", "header", "text", "pictures"],
-                    )
-                    # Форматируем результаты
-                    collection_results = []
-                    for hit in results[0]:
-                        collection_results.append(
-                            {
-                                "collection": collection_name,
-                                "document_name": hit.fields.get("document_name", ""),
-                                "header": hit.fields.get("header", ""),
-                                "content": hit.fields.get("text", ""),
-                                "pictures": hit.fields.get("pictures", ""),
-                                "score": float(hit.score),
-                            }
-                        )
-
-                    # Сохраняем статистику
-                    collection_stats[collection_name] = {
-                        "count": len(collection_results),
-                        "max_score": max([r["score"] for r in collection_results]) if collection_results else 0,
-                    }
-
-                    all_results.extend(collection_results)
-
-                except Exception as e:
-                    print(f"Ошибка при работе с коллекцией {collection_name}: {str(e)}")
-                    collection_stats[collection_name] = {"error": str(e)}
-
-            # Сортируем и выбираем топ-5
-            top_results = sorted(all_results, key=lambda x: x["score"], reverse=True)[:5]
+            query_embedding = embeddings.embed_query(input_data["query"])
+
+            # Выбираем топ-5 из всех коллекций
+            top_results, collection_stats = search_collections(
+                E5_COLLECTIONS, partial(e5_search, pool, query_embedding)
+            )
 
             # image_data = top_results[0]["pictures"]
             # image_data = json.loads(image_data.replace("'", "\"").replace("\\", "/"))
@@ -95,4 +98,17 @@ def createRAGChain(
                 # image_data=image_data
             )
 
+        async def ainvoke(self, input_data: RAGInput) -> RAGOutput:
+            query_embedding = await embeddings.aembed_query(input_data["query"])
+
+            top_results, collection_stats = await asearch_collections(
+                E5_COLLECTIONS, partial(e5_search, pool, query_embedding)
+            )
+
+            return RAGOutput(
+                search_results=top_results,
+                top_k=len(top_results),
+                collection_stats=collection_stats,
+            )
+
     return RAGRunnable()
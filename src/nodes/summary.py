@@ -3,10 +3,11 @@ from typing import Dict, List, Optional, TypedDict
 from langchain_core.messages import BaseMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
 
 from config import CLIENT_URL, LLM_NAME
+from monitoring import observe_llm
 
 
 class SummarizeInput(TypedDict):
@@ -38,15 +39,30 @@ def createSummarizeChain(
     )
 
     client = OpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    async_client = AsyncOpenAI(api_key="EMPTY", base_url=CLIENT_URL)
 
     class SummarizeRunnable(Runnable[SummarizeInput, SummarizeOutput]):
         def invoke(self, input_data: SummarizeInput) -> SummarizeOutput:
-            response = client.chat.completions.create(
-                model=llm_name,
-                messages=[{"role": "user", "content": prompt_template.format(text=input_data["text"])}],
-                temperature=0.1,
-                max_tokens=100,
-            )
+            with observe_llm("summary") as call:
+                response = client.chat.completions.create(
+                    model=llm_name,
+                    messages=[{"role": "user", "content": prompt_template.format(text=input_data["text"])}],
+                    temperature=0.1,
+                    max_tokens=100,
+                )
+                call.record(response)
+            summary = response.choices[0].message.content.strip()
+            return SummarizeOutput(summary=summary)
+
+        async def ainvoke(self, input_data: SummarizeInput) -> SummarizeOutput:
+            with observe_llm("summary") as call:
+                response = await async_client.chat.completions.create(
+                    model=llm_name,
+                    messages=[{"role": "user", "content": prompt_template.format(text=input_data["text"])}],
+                    temperature=0.1,
+                    max_tokens=100,
+                )
+                call.record(response)
             summary = response.choices[0].message.content.strip()
             return SummarizeOutput(summary=summary)
 
@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import CHUNK_SUMMARY_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ChunkSummaryStore:
+    """
+    Хранилище заранее посчитанных (независимых от запроса) суммаризаций чанков RAG-коллекций.
+
+    Суммаризации хранятся в SQLite с ключом (коллекция, id чанка) вместе с хешем исходного текста,
+    чтобы после переиндексации устаревшая суммаризация не использовалась.
+    При старте все записи загружаются в память: чтение в пути запроса не обращается к диску.
+    """
+
+    def __init__(self, path: str = CHUNK_SUMMARY_STORE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._summaries: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_summaries (
+                    collection TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (collection, chunk_id)
+                )
+                """
+            )
+        return self._conn
+
+    def load(self) -> "ChunkSummaryStore":
+        """Загружает все суммаризации в память; отсутствие файла не является ошибкой."""
+        if not os.path.exists(self.path):
+            logger.info(f"Chunk summary store not found: {self.path}, online summarization only")
+            return self
+        with self._lock:
+            rows = self._connect().execute("SELECT collection, chunk_id, text_hash, summary FROM chunk_summaries")
+            self._summaries = {
+                (collection, chunk_id): (hash_, summary) for collection, chunk_id, hash_, summary in rows
+            }
+        logger.info(f"Chunk summary store loaded: {len(self._summaries)} summaries")
+        return self
+
+    def get(self, collection: str, chunk_id, text: str) -> Optional[str]:
+        """Возвращает суммаризацию чанка, если она есть и посчитана для того же текста."""
+        entry = self._summaries.get((collection, str(chunk_id)))
+        if entry is None or entry[0] != text_hash(text):
+            return None
+        return entry[1]
+
+    def put(self, collection: str, chunk_id, text: str, summary: str) -> None:
+        key = (collection, str(chunk_id))
+        hash_ = text_hash(text)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO chunk_summaries VALUES (?, ?, ?, ?, ?)",
+                (key[0], key[1], hash_, summary, time.time()),
+            )
+            self._connect().commit()
+            self._summaries[key] = (hash_, summary)
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+
+def createChunkSummaryStore(path: str = CHUNK_SUMMARY_STORE_PATH) -> ChunkSummaryStore:
+    """
+    Создаёт хранилище суммаризаций чанков и загружает его содержимое в память.
+    """
+    return ChunkSummaryStore(path).load()
@@ -0,0 +1,183 @@
+import json
+from typing import Any, Dict, List, Literal, Optional, Tuple, TypedDict, get_args
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel, Field, ValidationError
+
+from caching import LRUCache, normalize_query
+from config import CLASSIFIER_CONFIDENCE_THRESHOLD, CLIENT_URL, LLM_NAME, PARAPHRASE_CACHE_SIZE
+from monitoring import observe_llm
+from nodes.classification import ClassificationType
+from nodes.local_classifier import LocalClassifier
+from nodes.normalizer import QueryNormalizer
+
+VALID_TYPES = set(get_args(ClassificationType))
+DEFAULT_CLASSIFICATION = "оператор"
+
+
+class UnderstandInput(TypedDict):
+    query: str
+    messages: List[BaseMessage]
+
+
+class UnderstandResponse(BaseModel):
+    """JSON-ответ LLM; его схема передаётся vLLM для guided decoding."""
+
+    paraphrased_query: str = Field(description="Перефразированный запрос", min_length=1)
+    classification: ClassificationType = Field(description="Тип классификации запроса")
+
+
+class UnderstandOutput(BaseModel):
+    paraphrased_query: str = Field(description="Перефразированный запрос")
+    classification: ClassificationType = Field(description="Тип классификации запроса")
+    # fallback — ответ LLM не прошёл валидацию, категория подставлена по умолчанию
+    source: Literal["llm", "local", "cache", "fallback"] = Field(description="Кто разобрал запрос", default="llm")
+    confidence: Optional[float] = Field(description="Уверенность локального классификатора", default=None)
+
+
+def createUnderstandChain(
+    llm_name: str = LLM_NAME,
+    headers: Optional[Dict[str, str]] = None,
+    normalizer: Optional[QueryNormalizer] = None,
+    local_classifier: Optional[LocalClassifier] = None,
+    confidence_threshold: float = CLASSIFIER_CONFIDENCE_THRESHOLD,
+) -> Runnable[UnderstandInput, UnderstandOutput]:
+    """
+    Создаёт цепочку разбора запроса: перефраз и классификация одним вызовом LLM вместо
+    последовательных цепочек paraphrase и classification.
+
+    LLM возвращает JSON по схеме UnderstandResponse (guided_json в vLLM). Если ответ не проходит
+    валидацию, перефразом считается исходный запрос (или поле из частично корректного JSON),
+    а категорией — "оператор" с source="fallback", как в цепочке классификации.
+
+    Повторные запросы берутся из кэша. Если локальный нормализатор уверен в перефразе, а локальный
+    классификатор — в категории перефраза, вызов LLM не выполняется.
+    """
+    prompt_template = PromptTemplate.from_template(
+        """Разберите запрос пользователя в сфере госзакупок: перефразируйте его и определите категорию.
+
+        Правила перефраза:
+        1. Корректно используйте термины: 44-ФЗ, 223-ФЗ, ЕИС, ЭТП, НМЦК и др.
+        2. Формализуйте согласно нормам закупочной документации
+        3. Удалите коммерчески чувствительную информацию
+        4. Сохраните юридические формулировки без изменений
+        5. Используйте официальный стиль извещений
+        6. Упростите сложные формулировки без потери смысла
+        ДАЖЕ ЕСЛИ НЕ ОТНОСИТСЯ К ТЕМЕ ГОСЗАКУПОК ТО СДЕЛАЙ ЧТОБЫ ОТНОСИЛОСЬ В КОНТЕКСТЕ ПРОДАЖИ И ПОКУПКИ
+
+        Категории (ровно одна):
+        - "термин": вопросы о определениях, терминах, понятиях
+        - "проблема": вопросы об ошибках, неполадках, проблемах
+        - "работа": вопросы о документах или работе пользователя
+        - "оператор": запросы, требующие человека-оператора
+        - "нейтрально": простые сообщения
+
+        Примеры:
+        "Что такое НМЦК в 44-ФЗ?" ->
+        {{"paraphrased_query": "Что такое начальная (максимальная) цена контракта согласно 44-ФЗ?", "classification": "термин"}}
+        "У меня проблема с аккредитацией на росэлторг" ->
+        {{"paraphrased_query": "Возникла проблема с аккредитацией на ЭТП", "classification": "проблема"}}
+        "как подать заявку на тендер?" ->
+        {{"paraphrased_query": "Как подать заявку на участие в закупке?", "classification": "работа"}}
+        "Соедините меня с поддержкой" ->
+        {{"paraphrased_query": "Прошу соединить с оператором поддержки", "classification": "оператор"}}
+        "Добрый день!" -> {{"paraphrased_query": "Добрый день!", "classification": "нейтрально"}}
+
+        Верните ТОЛЬКО JSON с полями paraphrased_query и classification, ничего больше.
+
+        Запрос для разбора: {query}
+        JSON:"""
+    )
+
+    client = OpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    async_client = AsyncOpenAI(api_key="EMPTY", base_url=CLIENT_URL)
+    response_schema = UnderstandResponse.model_json_schema()
+
+    def build_request(input_data: UnderstandInput) -> Dict[str, Any]:
+        prompt = prompt_template.format(query=input_data["query"].strip())
+
+        return dict(
+            model=llm_name,
+            messages=[
+                {"role": "system", "content": "Вы помощник для перефраза и классификации запросов."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0,
+            max_tokens=160,
+            stream=False,
+            extra_body={"guided_json": response_schema},
+        )
+
+    cache: LRUCache[Tuple[str, str]] = LRUCache(PARAPHRASE_CACHE_SIZE)
+
+    def parse_response(input_data: UnderstandInput, response) -> UnderstandOutput:
+        content = response.choices[0].message.content or ""
+        try:
+            parsed = UnderstandResponse.model_validate_json(content)
+            return UnderstandOutput(
+                paraphrased_query=parsed.paraphrased_query.strip(), classification=parsed.classification
+            )
+        except ValidationError:
+            pass
+
+        # Невалидный ответ: перефраз берём из JSON, если он есть, категория — значение по умолчанию
+        paraphrased_query = input_data["query"].strip()
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get("paraphrased_query"), str):
+            paraphrased_query = data["paraphrased_query"].strip() or paraphrased_query
+        return UnderstandOutput(
+            paraphrased_query=paraphrased_query, classification=DEFAULT_CLASSIFICATION, source="fallback"
+        )
+
+    def understand_locally(input_data: UnderstandInput) -> Optional[UnderstandOutput]:
+        cached = cache.get(normalize_query(input_data["query"]))
+        if cached is not None:
+            return UnderstandOutput(paraphrased_query=cached[0], classification=cached[1], source="cache")
+
+        if normalizer is None or local_classifier is None:
+            return None
+        result = normalizer.normalize(input_data["query"])
+        if not result.confident:
+            return None
+        label, confidence = local_classifier.predict(result.text)
+        if confidence < confidence_threshold or label not in VALID_TYPES:
+            return None
+        return UnderstandOutput(
+            paraphrased_query=result.text, classification=label, source="local", confidence=confidence
+        )
+
+    def remember(input_data: UnderstandInput, output: UnderstandOutput) -> UnderstandOutput:
+        # Ответ по умолчанию после невалидного JSON не кэшируется, повторный запрос снова уйдёт в LLM
+        if output.source == "fallback":
+            return output
+        cache.put(normalize_query(input_data["query"]), (output.paraphrased_query, output.classification))
+        return output
+
+    class UnderstandRunnable(Runnable[UnderstandInput, UnderstandOutput]):
+        def invoke(self, input_data: UnderstandInput) -> UnderstandOutput:
+            local_result = understand_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("understand") as call:
+                response = client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return remember(input_data, parse_response(input_data, response))
+
+        async def ainvoke(self, input_data: UnderstandInput) -> UnderstandOutput:
+            local_result = understand_locally(input_data)
+            if local_result is not None:
+                return local_result
+
+            with observe_llm("understand") as call:
+                response = await async_client.chat.completions.create(**build_request(input_data))
+                call.record(response)
+            return remember(input_data, parse_response(input_data, response))
+
+    return UnderstandRunnable()
@@ -1,10 +1,15 @@
+from protection.admission import AdmissionController, AdmissionRejected
 from protection.exceeding import ExceedingProtector
 from protection.models import ProtectionResult, ProtectionStatus
 from protection.overall import ProtectorsAccumulator
+from protection.rate_limit import RateLimitProtector
 
 __all__ = [
+    "AdmissionController",
+    "AdmissionRejected",
     "ProtectionResult",
     "ProtectionStatus",
     "ProtectorsAccumulator",
     "ExceedingProtector",
+    "RateLimitProtector",
 ]
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from monitoring.instruments import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE, ADMISSION_WAIT
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен к обработке: очередь заполнена или ожидание слота истекло."""
+
+
+class AdmissionController:
+    """
+    Допуск запросов к обработке: не больше max_in_flight одновременно.
+
+    Если свободный слот есть, запрос проходит без ожидания. Иначе он ждёт в очереди
+    (не дольше queue_timeout), а если в очереди уже max_queue запросов, сразу отклоняется.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        ADMISSION_IN_FLIGHT.set_function(lambda: {(): self.in_flight})
+        ADMISSION_QUEUE.set_function(lambda: {(): self.waiting})
+
+    async def acquire(self) -> None:
+        """Занимает слот обработки; при переполнении очереди или по таймауту выбрасывает AdmissionRejected."""
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise AdmissionRejected(f"{self.waiting} prompts are already waiting")
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(f"No processing slot within {self.queue_timeout}s") from None
+            finally:
+                self.waiting -= 1
+                ADMISSION_WAIT.observe(time.perf_counter() - start)
+        else:
+            # Свободный слот: acquire завершается без переключения задач
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
@@ -6,7 +6,7 @@ from protection.models import ProtectionResult
 class BaseProtector(ABC):
 
     @abstractmethod
-    def check(self, query: str) -> ProtectionResult:
+    def check(self, query: str, chat_id: str = "") -> ProtectionResult:
         """Check query"""
 
 
@@ -7,7 +7,7 @@ class ExceedingProtector(BaseProtector):
     def __init__(self, max_len: int) -> None:
         self.max_len = max_len
 
-    def check(self, query: str) -> ProtectionResult:
+    def check(self, query: str, chat_id: str = "") -> ProtectionResult:
         if len(query) > self.max_len:
             return ProtectionResult(
                 message=f"Длина запроса превышает максимально допустимую величину в {self.max_len} символов.",
@@ -5,6 +5,8 @@ from dataclasses import dataclass
 class ProtectionStatus(enum.Enum):
     ok = "ok"
     exceed = "exceed"
+    rate_limited = "rate_limited"
+    overloaded = "overloaded"
 
 
 @dataclass()
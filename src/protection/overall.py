@@ -1,19 +1,49 @@
-from typing import List
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
 
+from monitoring.instruments import PROTECTION_REJECTIONS
+from protection.admission import AdmissionController, AdmissionRejected
 from protection.base import BaseProtector
 from protection.models import ProtectionResult, ProtectionStatus
 
+OVERLOADED_MESSAGE = "Ассистент сейчас перегружен запросами. Пожалуйста, повторите вопрос через минуту."
+
 
 class ProtectorsAccumulator:
-    def __init__(self, protectors: List[BaseProtector]) -> None:
+    def __init__(self, protectors: List[BaseProtector], admission: Optional[AdmissionController] = None) -> None:
         self.protectors = protectors
+        self.admission = admission
 
-    def check(self, query: str) -> ProtectionResult:
+    def check(self, query: str, chat_id: str = "") -> ProtectionResult:
         for protector in self.protectors:
-            res = protector.check(query)
+            res = protector.check(query, chat_id)
             if res.status is not ProtectionStatus.ok:
+                PROTECTION_REJECTIONS.inc(reason=res.status.value)
                 return res
         return ProtectionResult(
             message="",
             status=ProtectionStatus.ok,
         )
+
+    @asynccontextmanager
+    async def admit(self, query: str, chat_id: str = "") -> AsyncIterator[ProtectionResult]:
+        """
+        Проверяет запрос и занимает слот обработки на время блока async with.
+        Возвращает результат проверки; при статусе не ok запрос обрабатывать не нужно.
+        """
+        res = self.check(query, chat_id)
+        if res.status is not ProtectionStatus.ok or self.admission is None:
+            yield res
+            return
+
+        try:
+            await self.admission.acquire()
+        except AdmissionRejected:
+            PROTECTION_REJECTIONS.inc(reason=ProtectionStatus.overloaded.value)
+            yield ProtectionResult(message=OVERLOADED_MESSAGE, status=ProtectionStatus.overloaded)
+            return
+
+        try:
+            yield res
+        finally:
+            self.admission.release()
@@ -0,0 +1,48 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from protection.base import BaseProtector
+from protection.models import ProtectionResult, ProtectionStatus
+
+
+class RateLimitProtector(BaseProtector):
+    """
+    Ограничение частоты запросов одного чата (chat_id) токен-бакетом.
+
+    Бакет вмещает burst токенов и пополняется со скоростью rate_per_minute; запрос тратит токен.
+    Бакеты хранятся в LRU-словаре не больше max_chats: вытесняются давно неактивные чаты,
+    у которых бакет к этому времени всё равно полон.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_chats: int = 100000) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_chats = max_chats
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # chat_id -> (токены, время)
+        self._lock = threading.Lock()
+
+    def check(self, query: str, chat_id: str = "") -> ProtectionResult:
+        if self.rate <= 0:
+            return ProtectionResult(message="", status=ProtectionStatus.ok)
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(chat_id, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[chat_id] = (tokens, now)
+            if len(self._buckets) > self.max_chats:
+                self._buckets.popitem(last=False)
+
+        if allowed:
+            return ProtectionResult(message="", status=ProtectionStatus.ok)
+        retry_after = math.ceil((1.0 - tokens) / self.rate)
+        return ProtectionResult(
+            message=f"Слишком много запросов. Пожалуйста, повторите через {retry_after} с.",
+            status=ProtectionStatus.rate_limited,
+        )
@@ -1,15 +1,58 @@
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Any, Dict, Hashable, Optional
 
 from langchain_core.messages import AIMessage
 from langchain_core.runnables import Runnable
 
+from caching import SingleFlight, normalize_query
+from config import PARAPHRASE_LOCAL_ENABLED, SINGLEFLIGHT_ENABLED, UNDERSTAND_FUSED
 from nodes.answer import AnswerInput, createAnswerChain
 from nodes.classification import ClassificationInput, createClassificationChain
+from nodes.embeddings import QueryEmbeddings, createQueryEmbeddings
 from nodes.faq_chain import RAGInput, createFAQChain
+from nodes.hybrid_chain import createHybridChain
+from nodes.local_classifier import loadLocalClassifier
+from nodes.milvus_pool import MilvusCollectionPool
+from nodes.normalizer import createQueryNormalizer
 from nodes.paraphrase import ParaphraseInput, createParaphraseChain
 from nodes.rag_chain import RAGInput, createRAGChain
 from nodes.summary import SummarizeInput, createSummarizeChain
+from nodes.summary_store import ChunkSummaryStore, createChunkSummaryStore
+from nodes.understand import UnderstandInput, UnderstandOutput, createUnderstandChain
+
+
+def coalescing_key(input_data: Dict[str, Any]) -> Hashable:
+    """
+    Ключ объединения вызовов цепочки: нормализованный запрос, история диалога и остальные поля входа.
+    user_id в ключ не входит: цепочки используют его только для логов.
+    """
+    key = []
+    for name, value in sorted(input_data.items()):
+        if name == "user_id":
+            continue
+        if name == "query":
+            value = normalize_query(value)
+        elif name == "messages":
+            value = tuple((message.type, str(message.content)) for message in value)
+        key.append((name, value))
+    return tuple(key)
+
+
+class CoalescingRunnable(Runnable):
+    """
+    Обёртка цепочки: одновременные ainvoke с одинаковым входом (см. coalescing_key) выполняются один раз,
+    все вызывающие получают общий результат или исключение (caching.SingleFlight).
+    """
+
+    def __init__(self, runnable: Runnable, scope: str) -> None:
+        self.runnable = runnable
+        self._flights = SingleFlight(scope)
+
+    def invoke(self, input_data: Dict[str, Any]) -> Any:
+        return self.runnable.invoke(input_data)
+
+    async def ainvoke(self, input_data: Dict[str, Any]) -> Any:
+        return await self._flights.do(coalescing_key(input_data), lambda: self.runnable.ainvoke(input_data))
 
 
 @dataclass
@@ -24,6 +67,11 @@ class SupplierRunnablesVLLM:
         elasticSearch: Runnable для поиска по документам через Elasticsearch.
         answer: Runnable для генерации финального ответа пользователю.
         contextualize_chain: Runnable для генерации генерации контекста ответа пользователю.
+        embeddings: Модель эмбеддингов запросов, общая для RAG-поиска и семантического кэша ответов.
+        summary_store: Заранее посчитанные суммаризации чанков RAG-коллекций.
+        hybrid_chain: Runnable гибридного поиска (BM25 + E5 с RRF) для RETRIEVAL_MODE="hybrid".
+        understand: Runnable перефраза и классификации одним вызовом LLM; если задан, заменяет в графе
+            ноды paraphrase и classification.
     """
 
     answer: Runnable[AnswerInput, AIMessage]
@@ -32,11 +80,18 @@ class SupplierRunnablesVLLM:
     classification: Runnable[ClassificationInput, AIMessage]
     paraphrase: Runnable[ParaphraseInput, AIMessage]
     summary: Runnable[SummarizeInput, AIMessage]
+    embeddings: QueryEmbeddings
+    summary_store: ChunkSummaryStore
+    hybrid_chain: Optional[Runnable[RAGInput, AIMessage]] = None
+    understand: Optional[Runnable[UnderstandInput, UnderstandOutput]] = None
 
 
 def createSupplierRunnablesVLLM(
     llm_name: str,
     headers: Optional[Dict[str, str]] = None,
+    embeddings: Optional[QueryEmbeddings] = None,
+    milvus_pool: Optional[MilvusCollectionPool] = None,
+    fused_understanding: bool = UNDERSTAND_FUSED,
 ) -> SupplierRunnablesVLLM:
     """
     Создаёт и возвращает набор Runnable для Supplier.
@@ -44,17 +99,43 @@ def createSupplierRunnablesVLLM(
     Args:
         llm_name: Название модели LLM.
         headers: Заголовки для HTTP-запросов (необязательно).
+        embeddings: Модель эмбеддингов запросов (по умолчанию создаётся E5).
+        milvus_pool: Пул коллекций Milvus (по умолчанию общий для процесса).
+        fused_understanding: Перефраз и классификация одним вызовом LLM (цепочка understand).
 
     Returns:
         SupplierRunnablesVLLM: Набор Runnable для SupplierAssistant.
     """
     # Инициализация всех цепочек
     answer = createAnswerChain(llm_name=llm_name, headers=headers)
-    rag_chain = createRAGChain()
-    faq_chain = createFAQChain()
-    paraphrase = createParaphraseChain(llm_name=llm_name, headers=headers)
-    classification = createClassificationChain(llm_name=llm_name, headers=headers)
+    embeddings = embeddings or createQueryEmbeddings()
+    rag_chain = createRAGChain(embeddings=embeddings, pool=milvus_pool)
+    faq_chain = createFAQChain(pool=milvus_pool)
+    hybrid_chain = createHybridChain(embeddings=embeddings, pool=milvus_pool)
+    normalizer = createQueryNormalizer() if PARAPHRASE_LOCAL_ENABLED else None
+    local_classifier = loadLocalClassifier()
+    paraphrase = createParaphraseChain(llm_name=llm_name, headers=headers, normalizer=normalizer)
+    classification = createClassificationChain(llm_name=llm_name, headers=headers, local_classifier=local_classifier)
+    understand = None
+    if fused_understanding:
+        understand = createUnderstandChain(
+            llm_name=llm_name, headers=headers, normalizer=normalizer, local_classifier=local_classifier
+        )
     summary = createSummarizeChain(llm_name=llm_name, headers=headers)
+    summary_store = createChunkSummaryStore()
+
+    if SINGLEFLIGHT_ENABLED:
+        # answer не оборачивается: токены ответа стримятся в поток графа каждого запроса,
+        # а одинаковые запросы целиком объединяются в SupplierHandler
+        paraphrase = CoalescingRunnable(paraphrase, "paraphrase")
+        classification = CoalescingRunnable(classification, "classification")
+        faq_chain = CoalescingRunnable(faq_chain, "faq_search")
+        rag_chain = CoalescingRunnable(rag_chain, "rag_search")
+        hybrid_chain = CoalescingRunnable(hybrid_chain, "hybrid_search")
+        summary = CoalescingRunnable(summary, "summary")
+        if understand is not None:
+            understand = CoalescingRunnable(understand, "understand")
+
     return SupplierRunnablesVLLM(
         answer=answer,
         rag_chain=rag_chain,
@@ -62,4 +143,8 @@ def createSupplierRunnablesVLLM(
         classification=classification,
         paraphrase=paraphrase,
         summary=summary,
+        embeddings=embeddings,
+        summary_store=summary_store,
+        hybrid_chain=hybrid_chain,
+        understand=understand,
     )
@@ -0,0 +1,117 @@
+"""
+Проверка бэкендов модели эмбеддингов запросов: совпадение с эталоном и задержка.
+
+Для каждого бэкенда считается косинусное сходство его эмбеддингов с эталонными (hf, fp32),
+совпадение ближайшего фрагмента на небольшом корпусе и задержка одного запроса (p50/p95),
+как в сервисе — по одному запросу без батчей. Код возврата 1, если минимальное сходство
+ниже --min-cosine.
+
+С --export-onnx модель экспортируется в ONNX с динамическим int8-квантованием; полученный
+каталог и файл задаются в EMBEDDING_MODEL_NAME и EMBEDDING_ONNX_FILE для бэкенда onnx.
+
+Запуск (из каталога src):
+    python -m scripts.check_embedding_backends [--backends torch-int8 onnx] [--queries queries.txt]
+    python -m scripts.check_embedding_backends --export-onnx data/e5-onnx [--quantize avx2]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.fakes import SAMPLE_QUERIES, SAMPLE_TOPICS
+from config import EMBEDDING_DEVICE, EMBEDDING_MODEL_NAME, EMBEDDING_QUERY_PREFIX
+from nodes.embedding_backends import EMBEDDING_BACKENDS, load_embedding_model
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("check_embedding_backends")
+
+
+def normalized(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def evaluate(model, queries: List[str], passages: List[str], repeats: int) -> Dict:
+    query_vectors = normalized([model.embed_query(query) for query in queries])
+    passage_vectors = normalized(model.embed_documents(passages))
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            model.embed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "queries": query_vectors,
+        "top1": (query_vectors @ passage_vectors.T).argmax(axis=1),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def export_onnx(output_dir: str, quantize: str) -> None:
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", backend="onnx")
+    model.save_pretrained(output_dir)
+    export_dynamic_quantized_onnx_model(model, quantization_config=quantize, model_name_or_path=output_dir)
+    logger.info(
+        f"Exported to {output_dir}; use EMBEDDING_BACKEND=onnx EMBEDDING_MODEL_NAME={output_dir} "
+        f"EMBEDDING_ONNX_FILE=onnx/model_qint8_{quantize}.onnx"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check parity and latency of query embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx"], choices=sorted(EMBEDDING_BACKENDS))
+    parser.add_argument("--reference", default="hf", choices=sorted(EMBEDDING_BACKENDS))
+    parser.add_argument("--reference-device", default=EMBEDDING_DEVICE)
+    parser.add_argument("--queries", help="файл с запросами, по одному в строке (по умолчанию — примеры бенчмарка)")
+    parser.add_argument("--repeats", type=int, default=5, help="повторов каждого запроса для замера задержки")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--export-onnx", metavar="DIR", help="экспортировать модель в ONNX с int8-квантованием и выйти")
+    parser.add_argument("--quantize", default="avx2", choices=["arm64", "avx2", "avx512", "avx512_vnni"])
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        export_onnx(args.export_onnx, args.quantize)
+        return
+
+    queries = SAMPLE_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    queries = [EMBEDDING_QUERY_PREFIX + query for query in queries]
+
+    reference_model = load_embedding_model(args.reference, EMBEDDING_MODEL_NAME, args.reference_device)
+    reference = evaluate(reference_model, queries, SAMPLE_TOPICS, args.repeats)
+    logger.info(
+        f"{args.reference:<12} p50 {reference['p50_ms']:8.1f} ms  p95 {reference['p95_ms']:8.1f} ms (reference)"
+    )
+
+    failed = False
+    for backend in args.backends:
+        start = time.perf_counter()
+        model = load_embedding_model(backend, EMBEDDING_MODEL_NAME, "cpu")
+        load_time = time.perf_counter() - start
+        result = evaluate(model, queries, SAMPLE_TOPICS, args.repeats)
+
+        cosines = (result["queries"] * reference["queries"]).sum(axis=1)
+        top1_agreement = float((result["top1"] == reference["top1"]).mean())
+        failed |= float(cosines.min()) < args.min_cosine
+        logger.info(
+            f"{backend:<12} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+            f"cosine min {cosines.min():.4f} mean {cosines.mean():.4f}  top-1 agreement {top1_agreement:.0%}  "
+            f"load {load_time:.1f}s"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Экспорт коллекций Milvus в локальный снимок для RETRIEVAL_BACKEND="local" (nodes/local_index.py).
+
+Из E5-коллекций выгружаются векторы и скалярные поля, из BM25-коллекций — текст, по которому
+Milvus строит BM25 (вход функции BM25 в схеме коллекции); постинги BM25 строятся локально.
+Каждый экспорт пишется в новый каталог версии (<output>-<время>), а <output> — символическая ссылка
+на текущую версию, которая переключается атомарно: в любой момент путь снимка и его manifest.json существуют.
+Запущенный сервис перечитывает снимок при следующей проверке; предыдущая версия сохраняется до следующего
+экспорта, пока сервис мог ещё не переключиться на новую.
+
+Запуск (из каталога src):
+    python -m scripts.export_local_index [--output data/local_index] [--collections ...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from pymilvus import DataType, FunctionType
+
+from config import COLLECTIONS, E5_COLLECTIONS, LOCAL_BM25_B, LOCAL_BM25_K1, LOCAL_INDEX_PATH, MILVUS_HOST, MILVUS_PORT
+from nodes.local_index import MANIFEST_FILE, ROWS_FILE, LocalBM25Index, LocalDenseIndex
+from nodes.milvus_pool import get_milvus_pool
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("export_local_index")
+
+
+def _metric(collection, field: str) -> str:
+    for index in collection.indexes:
+        if index.field_name == field:
+            return index.params.get("metric_type", "COSINE")
+    return "COSINE"
+
+
+def export_collection(collection, directory: str, batch_size: int) -> dict:
+    schema = collection.schema
+    primary_key = schema.primary_field.name
+    dense_fields = [field.name for field in schema.fields if field.dtype == DataType.FLOAT_VECTOR]
+    # Разреженные поля BM25 вычисляются сервером и не выгружаются: индекс строится по входному тексту
+    bm25_inputs = {
+        function.output_field_names[0]: function.input_field_names[0]
+        for function in schema.functions
+        if function.type == FunctionType.BM25
+    }
+    output_fields = [field.name for field in schema.fields if field.dtype != DataType.SPARSE_FLOAT_VECTOR]
+
+    rows: List[dict] = []
+    vectors: Dict[str, List[List[float]]] = {field: [] for field in dense_fields}
+    iterator = collection.query_iterator(batch_size=batch_size, output_fields=output_fields)
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            for row in batch:
+                row = dict(row)
+                for field in dense_fields:
+                    vectors[field].append(row.pop(field))
+                rows.append(row)
+    finally:
+        iterator.close()
+
+    os.makedirs(directory)
+    with open(os.path.join(directory, ROWS_FILE), "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, default=str)
+
+    meta = {"count": len(rows), "primary_key": primary_key, "dense": {}, "bm25": {}}
+    for field in dense_fields:
+        metric = _metric(collection, field)
+        matrix = np.asarray(vectors[field], dtype=np.float32).reshape(len(rows), -1)
+        LocalDenseIndex(LocalDenseIndex.prepare(matrix, metric), metric).save(directory, field)
+        meta["dense"][field] = {"dim": matrix.shape[1], "metric": metric}
+    for field, text_field in bm25_inputs.items():
+        LocalBM25Index.build([row.get(text_field) or "" for row in rows]).save(directory, field)
+        meta["bm25"][field] = {"text_field": text_field}
+    return meta
+
+
+def export(output: str, collection_names: List[str], batch_size: int) -> None:
+    pool = get_milvus_pool()
+    output = output.rstrip(os.sep)
+    staging = f"{output}-{datetime.now():%Y%m%d-%H%M%S-%f}"
+    os.makedirs(staging)
+
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": f"{MILVUS_HOST}:{MILVUS_PORT}",
+        "bm25_params": {"k1": LOCAL_BM25_K1, "b": LOCAL_BM25_B},
+        "collections": {},
+    }
+    for collection_name in collection_names:
+        start = time.perf_counter()
+        meta = export_collection(pool.get(collection_name), os.path.join(staging, collection_name), batch_size)
+        manifest["collections"][collection_name] = meta
+        logger.info(f"{collection_name}: {meta['count']} rows exported in {time.perf_counter() - start:.1f}s")
+
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    switch_snapshot(output, staging)
+    logger.info(f"Local index snapshot written: {output} -> {staging}")
+
+
+def switch_snapshot(output: str, version: str) -> None:
+    """
+    Атомарно переключает ссылку output на каталог версии version (os.replace временной ссылки поверх output)
+    и удаляет версии старше предыдущей. Открытые сервисом memory map удалённых файлов остаются валидными.
+    """
+    previous = os.path.realpath(output) if os.path.islink(output) else None
+    if os.path.isdir(output) and not os.path.islink(output):
+        # Снимок старого формата (каталог, а не ссылка): однократно переносится в каталог версии
+        previous = f"{output}-legacy"
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(output, previous)
+
+    link = f"{output}.link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, output)
+
+    parent = os.path.dirname(output) or "."
+    prefix = f"{os.path.basename(output)}-"
+    keep = {os.path.realpath(version), previous}
+    for name in os.listdir(parent):
+        path = os.path.realpath(os.path.join(parent, name))
+        if name.startswith(prefix) and os.path.isdir(path) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snapshot Milvus collections into a local in-process search index")
+    parser.add_argument("--output", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--collections", nargs="+", default=E5_COLLECTIONS + COLLECTIONS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    export(args.output, args.collections, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
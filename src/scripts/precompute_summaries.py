@@ -0,0 +1,91 @@
+"""
+Офлайн-расчёт суммаризаций длинных чанков RAG-коллекций.
+
+Суммаризации не зависят от запроса пользователя и сохраняются в ChunkSummaryStore,
+откуда их читает нода summary вместо обращения к LLM.
+
+Запуск (из каталога src):
+    python -m scripts.precompute_summaries [--collections supplier_e5 ...] [--force]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import List
+
+from config import (
+    CHUNK_SUMMARY_STORE_PATH,
+    E5_COLLECTIONS,
+    LLM_NAME,
+    SUMMARY_MAX_CHUNK_CONTEXT,
+    SUMMARY_MAX_CONCURRENCY,
+    SUMMARY_MIN_CHUNK_LENGTH,
+)
+from nodes.milvus_pool import get_milvus_pool
+from nodes.summary import createSummarizeChain
+from nodes.summary_store import createChunkSummaryStore
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("precompute_summaries")
+
+
+async def precompute(collections: List[str], store_path: str, concurrency: int, batch_size: int, force: bool) -> None:
+    store = createChunkSummaryStore(store_path)
+    summarize = createSummarizeChain(llm_name=LLM_NAME)
+    pool = get_milvus_pool()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize_chunk(collection_name: str, chunk_id, text: str) -> None:
+        async with semaphore:
+            result = await summarize.ainvoke({"text": "Контекст: " + text[:SUMMARY_MAX_CHUNK_CONTEXT], "messages": []})
+        store.put(collection_name, chunk_id, text, result.summary)
+
+    for collection_name in collections:
+        collection = pool.get(collection_name)
+        primary_key = collection.primary_field.name
+        iterator = collection.query_iterator(batch_size=batch_size, output_fields=["text"])
+        total, computed, skipped = 0, 0, 0
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+
+                tasks = []
+                for row in rows:
+                    total += 1
+                    text = row.get("text", "")
+                    if len(text) <= SUMMARY_MIN_CHUNK_LENGTH:
+                        continue
+                    if not force and store.get(collection_name, row[primary_key], text) is not None:
+                        skipped += 1
+                        continue
+                    tasks.append(summarize_chunk(collection_name, row[primary_key], text))
+
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.error(f"Summarization failed in {collection_name}: {result}")
+                    else:
+                        computed += 1
+                logger.info(f"{collection_name}: processed {total} chunks, summarized {computed}, up to date {skipped}")
+        finally:
+            iterator.close()
+
+    logger.info(f"Chunk summary store now holds {len(store)} summaries: {store_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute query-independent summaries for long RAG chunks")
+    parser.add_argument("--collections", nargs="+", default=E5_COLLECTIONS)
+    parser.add_argument("--store", default=CHUNK_SUMMARY_STORE_PATH)
+    parser.add_argument("--concurrency", type=int, default=SUMMARY_MAX_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--force", action="store_true", help="recompute summaries that are already up to date")
+    args = parser.parse_args()
+
+    asyncio.run(precompute(args.collections, args.store, args.concurrency, args.batch_size, args.force))
+
+
+if __name__ == "__main__":
+    main()
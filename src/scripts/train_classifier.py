@@ -0,0 +1,106 @@
+"""
+Обучение локального классификатора запросов на логах классификации LLM.
+
+Пары «запрос — метка» восстанавливаются из коллекции logs: нода classification пишет подряд
+запись "query" с текстом запроса и запись "classification" с меткой LLM. Предсказания самого
+локального классификатора (с пометкой "local") в обучение не попадают.
+
+Запуск (из каталога src):
+    python -m scripts.train_classifier [--output data/classifier.joblib] [--test-size 0.2]
+"""
+
+import argparse
+import logging
+import time
+from typing import List, Tuple
+
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+
+from config import CLASSIFIER_CONFIDENCE_THRESHOLD, CLASSIFIER_MODEL_PATH, MONGO_DB_PATH
+from nodes.local_classifier import LocalClassifier
+from storage import get_logs_collection, get_mongo_client
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("train_classifier")
+
+LABEL_PREFIX = "Классификация: "
+VALID_LABELS = {"термин", "проблема", "работа", "оператор", "нейтрально"}
+
+
+def load_training_pairs(logs_collection) -> Tuple[List[str], List[str]]:
+    queries, labels = [], []
+    last_query = {}
+    # Записи query и classification одного хода пишутся подряд и часто совпадают по времени (точность
+    # MongoDB — миллисекунды); _id создаётся клиентом в порядке записи и сохраняет их порядок
+    cursor = logs_collection.find(
+        {"action": {"$in": ["query", "classification"]}},
+        {"user_id": 1, "action": 1, "details": 1},
+    ).sort([("timestamp", 1), ("_id", 1)])
+
+    for entry in cursor:
+        user_id = entry.get("user_id")
+        details = str(entry.get("details", ""))
+        if entry["action"] == "query":
+            last_query[user_id] = details
+            continue
+
+        query = last_query.pop(user_id, None)
+        label = details[len(LABEL_PREFIX) :] if details.startswith(LABEL_PREFIX) else ""
+        if query and label in VALID_LABELS:
+            queries.append(query)
+            labels.append(label)
+
+    return queries, labels
+
+
+def report(classifier: LocalClassifier, queries: List[str], labels: List[str], threshold: float) -> None:
+    predictions, confidences, latencies = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        label, confidence = classifier.predict(query)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        predictions.append(label)
+        confidences.append(confidence)
+
+    confident = np.array(confidences) >= threshold
+    labels_arr, predictions_arr = np.array(labels), np.array(predictions)
+
+    logger.info(f"Accuracy vs LLM labels: {accuracy_score(labels, predictions):.3f} on {len(labels)} queries")
+    logger.info("\n" + classification_report(labels, predictions, zero_division=0))
+    covered_accuracy = (labels_arr[confident] == predictions_arr[confident]).mean() if confident.any() else 0
+    logger.info(
+        f"Threshold {threshold}: local coverage {confident.mean():.1%}, accuracy on covered {covered_accuracy:.3f}"
+    )
+    logger.info(
+        f"Latency per query: p50 {np.percentile(latencies, 50):.0f} us, p99 {np.percentile(latencies, 99):.0f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local query classifier from LLM classification logs")
+    parser.add_argument("--output", default=CLASSIFIER_MODEL_PATH)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=CLASSIFIER_CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    logs_collection = get_logs_collection(get_mongo_client(MONGO_DB_PATH))
+    queries, labels = load_training_pairs(logs_collection)
+    logger.info(f"Loaded {len(queries)} labelled queries: { {label: labels.count(label) for label in set(labels)} }")
+    if len(set(labels)) < 2:
+        raise SystemExit("Not enough labelled data to train a classifier")
+
+    stratify = labels if min(labels.count(label) for label in set(labels)) >= 2 else None
+    train_queries, test_queries, train_labels, test_labels = train_test_split(
+        queries, labels, test_size=args.test_size, random_state=42, stratify=stratify
+    )
+    report(LocalClassifier.train(train_queries, train_labels), test_queries, test_labels, args.threshold)
+
+    # Итоговая модель обучается на всех данных
+    LocalClassifier.train(queries, labels).save(args.output)
+    logger.info(f"Model saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
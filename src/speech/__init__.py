@@ -0,0 +1,10 @@
+from speech.streaming import AudioRingBuffer, StreamingTranscription
+from speech.transcriber import TranscriptionQueueFull, TranscriptionWorker, to_whisper_audio
+
+__all__ = [
+    "AudioRingBuffer",
+    "StreamingTranscription",
+    "TranscriptionQueueFull",
+    "TranscriptionWorker",
+    "to_whisper_audio",
+]
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from config import AUDIO_MAX_SECONDS, AUDIO_SAMPLE_RATE, WHISPER_STREAMING_WINDOW_SECONDS
+from speech.transcriber import TranscriptionWorker
+
+logger = logging.getLogger(__name__)
+
+# Окно режется по самому тихому участку в последней секунде, чтобы не разрезать слово
+CUT_SEARCH_SECONDS = 1.0
+CUT_FRAME_SECONDS = 0.05
+MIN_TAIL_SECONDS = 0.3  # более короткий хвост записи не распознаётся
+PROMPT_CHARS = 200  # сколько символов предыдущего текста передаётся в initial_prompt
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер int16 PCM фиксированного размера, выделенный один раз на сессию.
+    Позиции отсчитываются от начала записи; при переполнении затираются самые старые сэмплы.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.total = 0
+
+    @property
+    def oldest(self) -> int:
+        """Позиция самого старого сэмпла, который ещё хранится в буфере."""
+        return max(0, self.total - self.capacity)
+
+    def append(self, chunk: np.ndarray) -> None:
+        if len(chunk) >= self.capacity:
+            self.total += len(chunk) - self.capacity
+            chunk = chunk[-self.capacity :]
+        position = self.total % self.capacity
+        first = min(len(chunk), self.capacity - position)
+        self._data[position : position + first] = chunk[:first]
+        self._data[: len(chunk) - first] = chunk[first:]
+        self.total += len(chunk)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Возвращает копию сэмплов [start, end)."""
+        if start < self.oldest or end > self.total or start > end:
+            raise ValueError(f"Samples [{start}, {end}) are not in the buffer [{self.oldest}, {self.total})")
+        begin, finish = start % self.capacity, end % self.capacity
+        if end - start == 0:
+            return np.zeros(0, dtype=np.int16)
+        if begin < finish or finish == 0:
+            return self._data[begin : finish or self.capacity].copy()
+        return np.concatenate([self._data[begin:], self._data[:finish]])
+
+
+class StreamingTranscription:
+    """
+    Потоковое распознавание одной голосовой записи.
+
+    Сэмплы складываются в кольцевой буфер; как только накопилось окно window_seconds, оно
+    отправляется на распознавание в фоне, пока пользователь ещё говорит. Фрагменты распознаются
+    по порядку, и каждый получает предыдущий текст в качестве initial_prompt. В finish()
+    остаётся распознать только хвост записи.
+    """
+
+    def __init__(
+        self,
+        worker: TranscriptionWorker,
+        sample_rate: int = AUDIO_SAMPLE_RATE,
+        window_seconds: float = WHISPER_STREAMING_WINDOW_SECONDS,
+        max_seconds: float = AUDIO_MAX_SECONDS,
+    ) -> None:
+        self.worker = worker
+        self.sample_rate = sample_rate
+        self.window = int(window_seconds * sample_rate)
+        self.buffer = AudioRingBuffer(int(max(max_seconds, 2 * window_seconds) * sample_rate))
+        self._committed = 0  # позиция, до которой аудио уже отправлено на распознавание
+        self._segments: List[asyncio.Task] = []
+
+    def feed(self, chunk: np.ndarray) -> None:
+        self.buffer.append(chunk)
+        while self.window and self.buffer.total - self._committed >= self.window:
+            self._submit(self._cut_position(self._committed + self.window))
+
+    def _cut_position(self, end: int) -> int:
+        search = int(CUT_SEARCH_SECONDS * self.sample_rate)
+        frame = int(CUT_FRAME_SECONDS * self.sample_rate)
+        start = max(self._committed + frame, end - search)
+        region = self.buffer.read(start, end).astype(np.float32)
+        frames = len(region) // frame
+        if frames == 0:
+            return end
+        energy = (region[: frames * frame].reshape(frames, frame) ** 2).mean(axis=1)
+        return start + int(energy.argmin()) * frame + frame // 2
+
+    def _submit(self, end: int) -> None:
+        audio = self.buffer.read(self._committed, end)
+        self._committed = end
+        previous = self._segments[-1] if self._segments else None
+        self._segments.append(asyncio.create_task(self._transcribe_segment(audio, previous)))
+
+    async def _transcribe_segment(self, audio: np.ndarray, previous: Optional[asyncio.Task]) -> str:
+        prompt = None
+        if previous is not None:
+            prompt = (await previous)[-PROMPT_CHARS:] or None
+        return await self.worker.transcribe(audio, self.sample_rate, prompt=prompt)
+
+    async def finish(self) -> str:
+        """Распознаёт хвост записи, дожидается фоновых фрагментов и возвращает весь текст."""
+        if self.buffer.total - self._committed >= MIN_TAIL_SECONDS * self.sample_rate:
+            self._submit(self.buffer.total)
+        try:
+            texts = await asyncio.gather(*self._segments)
+        except Exception:
+            for task in self._segments:
+                task.cancel()
+            raise
+        logger.info(f"Streaming transcription: {len(texts)} segments, {self.buffer.total / self.sample_rate:.1f}s")
+        return " ".join(text for text in texts if text)
+
+    def cancel(self) -> None:
+        for task in self._segments:
+            task.cancel()
+
+    def recorded_audio(self) -> np.ndarray:
+        """Запись для проигрывания в чате (для очень длинных записей — последние max_seconds)."""
+        return self.buffer.read(self.buffer.oldest, self.buffer.total)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from typing import Any, Callable, Optional
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from config import AUDIO_SAMPLE_RATE, WHISPER_LANGUAGE, WHISPER_MAX_QUEUE, WHISPER_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Частота дискретизации, на которой работает Whisper (whisper.audio.SAMPLE_RATE)
+WHISPER_SAMPLE_RATE = 16000
+
+
+class TranscriptionQueueFull(Exception):
+    """Очередь распознавания заполнена, запись не принята."""
+
+
+def to_whisper_audio(audio: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE) -> np.ndarray:
+    """
+    Приводит int16 PCM к формату Whisper: float32 в [-1, 1] с частотой 16 кГц
+    (полифазная передискретизация, для 24 кГц — коэффициент 2/3).
+    """
+    samples = audio.astype(np.float32) / 32768.0
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        divisor = gcd(WHISPER_SAMPLE_RATE, sample_rate)
+        samples = resample_poly(samples, WHISPER_SAMPLE_RATE // divisor, sample_rate // divisor).astype(np.float32)
+    return samples
+
+
+class TranscriptionWorker:
+    """
+    Распознавание речи Whisper в выделенном пуле потоков.
+
+    Аудио передаётся в память (без временных файлов), event loop не блокируется, а число
+    ожидающих записей ограничено: при переполнении transcribe() выбрасывает TranscriptionQueueFull.
+    Вместо модели можно передать model_loader — тогда модель загружается при первом
+    распознавании или прогреве (warm_up), а не при создании объекта.
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        device: str = "cpu",
+        max_workers: int = WHISPER_MAX_WORKERS,
+        max_queue: int = WHISPER_MAX_QUEUE,
+        language: str = WHISPER_LANGUAGE,
+        model_loader: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        if model is None and model_loader is None:
+            raise ValueError("Either model or model_loader is required")
+        self._model = model
+        self._model_loader = model_loader
+        self._model_lock = threading.Lock()
+        self.device = device
+        self.language = language or None
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whisper")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._model_loader()
+                    logger.info(f"Whisper model loaded on {self.device} in {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    def warm_up(self) -> None:
+        """Загружает модель и распознаёт секунду тишины (первый прогон на GPU заметно дольше)."""
+        self.transcribe_sync(np.zeros(AUDIO_SAMPLE_RATE, dtype=np.int16))
+
+    def transcribe_sync(
+        self, audio: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE, prompt: Optional[str] = None
+    ) -> str:
+        start = time.perf_counter()
+        result = self.model.transcribe(
+            to_whisper_audio(audio, sample_rate),
+            language=self.language,
+            fp16=self.device.startswith("cuda"),
+            initial_prompt=prompt,
+        )
+        logger.info(f"Transcribed {len(audio) / sample_rate:.1f}s of audio in {time.perf_counter() - start:.2f}s")
+        return result["text"].strip()
+
+    async def transcribe(
+        self, audio: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE, prompt: Optional[str] = None
+    ) -> str:
+        """
+        Args:
+            prompt: Уже распознанный предыдущий текст (initial_prompt Whisper) для связности фрагментов.
+        """
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise TranscriptionQueueFull(f"{self._pending} recordings are already waiting")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.transcribe_sync, audio, sample_rate, prompt)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
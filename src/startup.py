@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from monitoring.instruments import STARTUP_READY, STARTUP_STEP_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """
+    Прогрев приложения и признак готовности.
+
+    Тяжёлые модели и подключения не загружаются при импорте: шаги прогрева (первый эмбеддинг,
+    первое распознавание, загрузка коллекций Milvus) выполняются по порядку в фоновом потоке,
+    пока сервер уже принимает подключения. Запросы ждут окончания прогрева (wait_ready).
+    Ошибка шага не останавливает прогрев — ресурс загрузится при первом запросе.
+    """
+
+    def __init__(self, started_at: Optional[float] = None) -> None:
+        """started_at — time.perf_counter() в начале запуска процесса, до тяжёлых импортов (по умолчанию — сейчас)."""
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._steps: List[Tuple[str, Callable[[], Any]]] = []
+        self._ready = threading.Event()
+        # Ожидающие корутины: поток прогрева будит их через call_soon_threadsafe своего event loop
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._waiters_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark(self, name: str) -> None:
+        """Запоминает время от начала запуска до текущего момента (например, импорт модулей)."""
+        self._record(name, time.perf_counter() - self.started_at)
+
+    def add_step(self, name: str, step: Callable[[], Any]) -> None:
+        self._steps.append((name, step))
+
+    def _record(self, name: str, duration: float) -> None:
+        self.timings[name] = round(duration, 3)
+        STARTUP_STEP_DURATION.set(duration, step=name)
+
+    def run(self) -> None:
+        """Выполняет шаги прогрева синхронно и отмечает приложение готовым."""
+        warm_up_start = time.perf_counter()
+        for name, step in self._steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.error(f"Warm-up step {name} failed: {e}")
+            self._record(name, time.perf_counter() - start)
+
+        self._record("warm_up", time.perf_counter() - warm_up_start)
+        self.mark("total")
+        with self._waiters_lock:
+            self._ready.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop ожидающего уже закрыт
+                pass
+        STARTUP_READY.set(1)
+        logger.info(
+            f"Startup finished: {self.timings}" + (f", failed steps: {list(self.errors)}" if self.errors else "")
+        )
+
+    def start_background(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+            self._thread.start()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Ждёт окончания прогрева, не блокируя event loop и не занимая поток. Возвращает False по таймауту."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._waiters_lock:
+            if self.ready:
+                return True
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._waiters_lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.perf_counter() - self.started_at, 3),
+            "timings": dict(self.timings),
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,17 @@
+from storage.log_sink import BufferedLogSink
+from storage.mongo import (
+    close_mongo_clients,
+    get_async_mongo_client,
+    get_logs_collection,
+    get_mongo_client,
+    pool_metrics,
+)
+
+__all__ = [
+    "BufferedLogSink",
+    "close_mongo_clients",
+    "get_async_mongo_client",
+    "get_logs_collection",
+    "get_mongo_client",
+    "pool_metrics",
+]
@@ -0,0 +1,224 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+from bson import json_util
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import (
+    LOG_SINK_BATCH_SIZE,
+    LOG_SINK_FLUSH_INTERVAL,
+    LOG_SINK_MAX_QUEUE,
+    LOG_SINK_RETRY_INTERVAL,
+    LOG_SINK_SPILL_PATH,
+)
+from monitoring.instruments import LOG_SINK_DROPPED, LOG_SINK_QUEUE, LOG_SINK_SPILLED, LOG_SINK_WRITTEN
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedLogSink:
+    """
+    Фоновая запись логов в MongoDB пачками.
+
+    write() только кладёт запись в ограниченную очередь, не блокируясь; фоновый поток записывает накопленное
+    через insert_many, когда набралось batch_size записей или прошло flush_interval секунд.
+    - Если очередь заполнена, запись попадает в буфер переполнения, который фоновый поток сбрасывает
+      в spill-файл; при переполнении и этого буфера самые старые записи отбрасываются (счётчик dropped)
+    - Если MongoDB недоступна, пачка дописывается в spill-файл и позже дозаписывается в коллекцию
+    - При завершении процесса очередь дописывается (close() вызывается через atexit)
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        batch_size: int = LOG_SINK_BATCH_SIZE,
+        flush_interval: float = LOG_SINK_FLUSH_INTERVAL,
+        max_queue: int = LOG_SINK_MAX_QUEUE,
+        spill_path: str = LOG_SINK_SPILL_PATH,
+        retry_interval: float = LOG_SINK_RETRY_INTERVAL,
+    ) -> None:
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._overflow: Deque[dict] = deque(maxlen=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_replay = 0.0
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        LOG_SINK_QUEUE.set_function(lambda: {(): self._queue.qsize()})
+
+    def write(self, entry: dict) -> None:
+        """Ставит запись в очередь; пока sink работает, не ждёт и не обращается к MongoDB и к диску."""
+        if not self._stop.is_set():
+            try:
+                self._queue.put_nowait(entry)
+                return
+            except queue.Full:
+                pass
+
+        if not self._thread.is_alive():
+            # После close() фонового потока нет, запись сразу уходит в spill-файл
+            self._spill([entry])
+            return
+
+        # Очередь переполнена или sink останавливается: запись сбросит в spill-файл фоновый поток (или close)
+        if len(self._overflow) == self._overflow.maxlen:
+            self.dropped += 1
+            LOG_SINK_DROPPED.inc()
+        self._overflow.append(entry)
+
+    def _next_batch(self) -> List[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._flush(batch)
+                self._spill_overflow()
+                if time.monotonic() - self._last_replay >= self.retry_interval:
+                    self._replay_spill()
+            except Exception:
+                # Поток не должен завершаться из-за одной пачки (например, InvalidDocument) или битого spill-файла
+                logger.exception("Log sink iteration failed")
+
+        # Дописываем всё, что осталось в очереди на момент остановки
+        try:
+            self._drain()
+        except Exception:
+            logger.exception("Log sink drain failed")
+
+    def _drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        self._spill_overflow()
+
+    def _spill_overflow(self) -> None:
+        entries = []
+        while self._overflow:
+            try:
+                entries.append(self._overflow.popleft())
+            except IndexError:
+                break
+        if entries:
+            logger.warning(f"Log queue is full, spilling {len(entries)} entries to disk")
+            self._spill(entries)
+
+    def _flush(self, batch: List[dict]) -> bool:
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            LOG_SINK_WRITTEN.inc(len(batch))
+            return True
+        except BulkWriteError as e:
+            # Часть записей могла быть уже записана (например, повтор после сбоя) — не повторяем
+            self.written += e.details.get("nInserted", 0)
+            LOG_SINK_WRITTEN.inc(e.details.get("nInserted", 0))
+            logger.error(f"Log batch partially written: {e.details.get('writeErrors', [])[:1]}")
+            return True
+        except PyMongoError as e:
+            self.failed_batches += 1
+            logger.error(f"Log batch write failed, spilling {len(batch)} entries: {e}")
+            self._spill(batch)
+            return False
+
+    def _spill(self, entries: List[dict]) -> None:
+        directory = os.path.dirname(self.spill_path)
+        with self._spill_lock:
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for entry in entries:
+                        f.write(json_util.dumps(entry, ensure_ascii=False) + "\n")
+                self.spilled += len(entries)
+                LOG_SINK_SPILLED.inc(len(entries))
+            except OSError as e:
+                logger.error(f"Log spill failed, {len(entries)} entries lost: {e}")
+
+    def _replay_spill(self) -> None:
+        """Дозаписывает в MongoDB логи из spill-файла."""
+        self._last_replay = time.monotonic()
+        replay_path = self.spill_path + ".replay"
+
+        with self._spill_lock:
+            # Файл от прерванной дозаписи не перезаписываем: сначала дозаписываем его
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        entries = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json_util.loads(line))
+                except ValueError as e:
+                    logger.error(f"Skipping malformed spilled log entry at line {line_number}: {e}")
+
+        for start in range(0, len(entries), self.batch_size):
+            if not self._flush(entries[start : start + self.batch_size]):
+                # MongoDB снова недоступна: оставшиеся записи уже в spill-файле (кроме ещё не отправленных)
+                self._spill(entries[start + self.batch_size :])
+                break
+        else:
+            logger.info(f"Replayed {len(entries)} spilled log entries")
+        os.remove(replay_path)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Останавливает фоновый поток, дописав очередь в MongoDB (или в spill-файл)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        # Записи, пришедшие после остановки фонового потока
+        self._spill_overflow()
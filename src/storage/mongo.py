@@ -0,0 +1,170 @@
+import logging
+import threading
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, WriteConcern
+from pymongo.collection import Collection
+from pymongo.monitoring import (
+    CommandFailedEvent,
+    CommandListener,
+    CommandStartedEvent,
+    CommandSucceededEvent,
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionClosedEvent,
+    ConnectionCreatedEvent,
+    ConnectionPoolListener,
+)
+
+from config import (
+    MONGO_APP_NAME,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_DB_PATH,
+    MONGO_LOG_WRITE_CONCERN,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+)
+from monitoring.instruments import MONGO_COMMAND_ERRORS, MONGO_COMMAND_LATENCY, MONGO_POOL_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+LOGS_DATABASE = "checkpointing_db"
+LOGS_COLLECTION = "logs"
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """Счётчики пула соединений MongoDB (открытые, занятые соединения, ошибки получения соединения)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.check_out_failed = 0
+
+    def _add(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        logger.warning(f"MongoDB connection pool cleared: {event.address}")
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event: ConnectionCreatedEvent) -> None:
+        self._add("created")
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event: ConnectionClosedEvent) -> None:
+        self._add("closed")
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: ConnectionCheckOutFailedEvent) -> None:
+        self._add("check_out_failed")
+
+    def connection_checked_out(self, event: ConnectionCheckedOutEvent) -> None:
+        self._add("checked_out")
+
+    def connection_checked_in(self, event: ConnectionCheckedInEvent) -> None:
+        self._add("checked_out", -1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "check_out_failed": self.check_out_failed,
+            }
+
+
+class CommandMetricsListener(CommandListener):
+    """Длительность и ошибки команд MongoDB (записи логов и чекпоинтов, чтение истории)."""
+
+    def started(self, event: CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: CommandSucceededEvent) -> None:
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event: CommandFailedEvent) -> None:
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_ERRORS.inc(command=event.command_name)
+
+
+pool_metrics = PoolMetricsListener()
+command_metrics = CommandMetricsListener()
+MONGO_POOL_CONNECTIONS.set_function(
+    lambda: {(state,): value for state, value in pool_metrics.stats().items() if state in ("open", "in_use")}
+)
+
+_lock = threading.Lock()
+_clients: Dict[str, MongoClient] = {}
+_async_clients: Dict[str, AsyncIOMotorClient] = {}
+
+
+def client_options() -> Dict[str, Any]:
+    """Общие настройки пула и таймаутов для синхронного и асинхронного клиентов."""
+    return {
+        "appname": MONGO_APP_NAME,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "event_listeners": [pool_metrics, command_metrics],
+    }
+
+
+def get_mongo_client(uri: str = MONGO_DB_PATH) -> MongoClient:
+    """
+    Возвращает общий для процесса синхронный клиент MongoDB (логи, скрипты).
+    Число соединений с MongoDB определяется числом процессов, а не компонентов.
+    """
+    with _lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(uri, **client_options())
+        return _clients[uri]
+
+
+def get_async_mongo_client(uri: str = MONGO_DB_PATH) -> AsyncIOMotorClient:
+    """
+    Возвращает общий для процесса асинхронный клиент MongoDB (чекпоинтер графа).
+    Клиент привязывается к event loop при первой операции, поэтому создавать его нужно внутри loop.
+    """
+    with _lock:
+        if uri not in _async_clients:
+            _async_clients[uri] = AsyncIOMotorClient(uri, **client_options())
+        return _async_clients[uri]
+
+
+def get_logs_collection(client: MongoClient) -> Collection:
+    """Коллекция плоских логов с write concern MONGO_LOG_WRITE_CONCERN."""
+    return client[LOGS_DATABASE].get_collection(LOGS_COLLECTION, write_concern=WriteConcern(w=MONGO_LOG_WRITE_CONCERN))
+
+
+def close_mongo_clients() -> None:
+    with _lock:
+        for client in list(_clients.values()) + list(_async_clients.values()):
+            client.close()
+        _clients.clear()
+        _async_clients.clear()